@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Batch runner: solves every task of a directory with several algorithms and
+weights in a process pool and streams one summary record per job into a
+JSONL or CSV file (chosen by the extension of the output file).
+
+Jobs already present in the output file are skipped, so an interrupted sweep
+is resumed by running the same command again. Tasks are recorded by their paths
+relative to the common directory of all the tasks of the run.
+
+Usage:
+    python3 src/batch.py data/ [task.xml ...] -o results.jsonl [-algorithms sipp,wsipp,focal]
+        [-weights 1.0,1.05,1.1,1.5,2.0] [-workers N] [-timeout seconds] [-eager] [-cache cache_dir] [-logs logs_dir]
+        [-heuristic manhattan|true] [-max-expansions N] [-max-time seconds] [-max-nodes N] [-validate]
+
+With -validate every found path is checked by validator.validate_result, and the
+record gets valid and the number of conflicts.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from multiprocessing import Pool
+import csv
+import glob
+import json
+import os
+import signal
+import sys
+import time
+
+from sipp_map import Map
+import planner
+import validator
+
+DEFAULT_WEIGHTS = (1.0, 1.05, 1.1, 1.5, 2.0)
+FIELDS = ("task", "algorithm", "weight", "status", "found", "steps", "nodes_created", "path_length", "cost",
+          "search_time", "load_time", "stale_pops", "avoided_pushes", "valid", "conflicts", "error")
+# Statuses of the jobs that a rerun does not repeat.
+DONE_STATUSES = ("ok", "no_path")
+
+# Algorithms and whether they take a weight. Unweighted ones run once per task with weight 1.0.
+ALGORITHMS = {
+    "sipp": False,
+    "wsipp": True,
+    "focal": True,
+    "anytime": True,
+}
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, task_path: str, algorithm: str, weight: float, task_name: Optional[str] = None):
+        self.task_path = task_path
+        self.algorithm = algorithm
+        self.weight = weight
+        self.task_name = task_name if task_name is not None else os.path.basename(task_path)
+
+    @property
+    def key(self) -> Tuple[str, str, float]:
+        return self.task_name, self.algorithm, float(self.weight)
+
+
+# Per-worker state: the maps loaded by this worker and the run options
+_maps: Dict[str, Map] = {}
+_options: dict = {}
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def _init_worker(options: dict):
+    _options.update(options)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _get_map(task_path: str) -> Tuple[Map, float]:
+    """
+    Returns the map of the task, parsing it only the first time this worker sees the task.
+    """
+    if task_path in _maps:
+        return _maps[task_path], 0.0
+    start = time.perf_counter()
+    task_map = Map(task_path, eager=_options.get("eager", False), cache_dir=_options.get("cache_dir"))
+    _maps[task_path] = task_map
+    return task_map, time.perf_counter() - start
+
+
+def run_job(job: Job) -> dict:
+    record = dict.fromkeys(FIELDS, "")
+    record.update(task=job.key[0], algorithm=job.algorithm, weight=job.weight)
+    timeout = _options.get("timeout")
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        task_map, record["load_time"] = _get_map(job.task_path)
+        result = planner.plan(task_map, job.weight, job.algorithm, heuristic=_options.get("heuristic", "manhattan"),
+                              budget=_options.get("budget"))
+        path = result.path
+        record.update(status=result.status, found=result.found, steps=result.steps,
+                      nodes_created=result.nodes_created, path_length=len(path), cost=result.cost,
+                      search_time=result.search_time, stale_pops=result.stale_pops,
+                      avoided_pushes=result.avoided_pushes)
+        if _options.get("validate") and result.found:
+            validation = validator.validate_result(task_map, result)
+            record.update(valid=validation.valid, conflicts=len(validation.conflicts))
+        if _options.get("logs_dir"):
+            name = os.path.splitext(job.task_name)[0].replace(os.sep, "_")
+            log_path = os.path.join(_options["logs_dir"], f"log_{name}_{job.algorithm}_w_{job.weight}.xml")
+            planner.write_log(job.task_path, log_path, result)
+    except JobTimeout:
+        # The lazily filled intervals may have been interrupted half-way
+        _maps.pop(job.task_path, None)
+        record.update(status="timeout", search_time=timeout)
+    except Exception as e:
+        _maps.pop(job.task_path, None)
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        if timeout and hasattr(signal, "SIGALRM"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return record
+
+
+def task_names(task_paths: List[str]) -> List[str]:
+    """
+    Names of the tasks in the records: their paths relative to the common directory of
+    all of them, so tasks with the same file name in different directories differ.
+    """
+    if not task_paths:
+        return []
+    directories = [os.path.dirname(os.path.abspath(task_path)) for task_path in task_paths]
+    root = os.path.commonpath(directories)
+    return [os.path.relpath(os.path.abspath(task_path), root) for task_path in task_paths]
+
+
+def make_jobs(task_paths: Iterable[str], algorithms: Iterable[str], weights: Iterable[float]) -> List[Job]:
+    task_paths = list(task_paths)
+    jobs = []
+    for task_path, task_name in zip(task_paths, task_names(task_paths)):
+        for algorithm in algorithms:
+            for weight in (weights if ALGORITHMS[algorithm] else (1.0,)):
+                jobs.append(Job(task_path, algorithm, weight, task_name))
+    return jobs
+
+
+def read_done(output_path: str) -> Set[Tuple[str, str, float]]:
+    """
+    Returns the keys of the jobs already finished in the output file. Jobs recorded with
+    any status other than "ok" or "no_path" (timeout, error, exhausted budget) are not
+    counted, so a rerun retries them and appends their new records.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, 'r', newline='') as f:
+        if output_path.endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    return {(record["task"], record["algorithm"], float(record["weight"])) for record in records
+            if record["status"] in DONE_STATUSES}
+
+
+class ResultWriter:
+    """
+    Appends records to a JSONL or CSV file, flushing after each one.
+    """
+
+    def __init__(self, output_path: str):
+        self.is_csv = output_path.endswith(".csv")
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self.file = open(output_path, 'a', newline='')
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, record: dict):
+        if self.is_csv:
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(task_paths: List[str], output_path: str, algorithms: Iterable[str] = ("sipp", "wsipp"),
+              weights: Iterable[float] = DEFAULT_WEIGHTS, workers: Optional[int] = None,
+              timeout: Optional[float] = None, eager: bool = False, cache_dir: Optional[str] = None,
+              logs_dir: Optional[str] = None, heuristic: str = "manhattan", budget: Optional[planner.Budget] = None,
+              validate: bool = False, verbose: bool = True) -> int:
+    """
+    Runs all jobs that are not in output_path yet. Returns the number of jobs run.
+    """
+    done = read_done(output_path)
+    jobs = [job for job in make_jobs(task_paths, algorithms, weights) if job.key not in done]
+    if logs_dir:
+        os.makedirs(logs_dir, exist_ok=True)
+    options = {"timeout": timeout, "eager": eager, "cache_dir": cache_dir, "logs_dir": logs_dir,
+               "heuristic": heuristic, "budget": budget, "validate": validate}
+
+    writer = ResultWriter(output_path)
+    pool = Pool(workers, initializer=_init_worker, initargs=(options,))
+    try:
+        for count, record in enumerate(pool.imap_unordered(run_job, jobs), 1):
+            writer.write(record)
+            if verbose:
+                print(f"[{count}/{len(jobs)}] {record['task']} {record['algorithm']} w={record['weight']} "
+                      f"{record['status']} steps={record['steps']} time={record['search_time']}"
+                      + ("" if record["valid"] in ("", True) else f" INVALID conflicts={record['conflicts']}"))
+        pool.close()
+    except KeyboardInterrupt:
+        print("Interrupted, finished jobs are saved")
+        pool.terminate()
+    finally:
+        pool.join()
+        writer.close()
+    return len(jobs)
+
+
+def get_option(name: str, default=None):
+    if name not in sys.argv:
+        return default
+    index = sys.argv.index(name)
+    if index + 1 >= len(sys.argv):
+        return default
+    return sys.argv[index + 1]
+
+
+def main():
+    options = {"-o", "-algorithms", "-weights", "-workers", "-timeout", "-cache", "-logs", "-heuristic",
+               "-max-expansions", "-max-time", "-max-nodes"}
+    paths, skip = [], False
+    for arg in sys.argv[1:]:
+        if skip:
+            skip = False
+        elif arg in options:
+            skip = True
+        elif not arg.startswith("-"):
+            paths.append(arg)
+
+    task_paths = []
+    for path in paths:
+        task_paths.extend(sorted(glob.glob(os.path.join(path, "*.xml"))) if os.path.isdir(path) else [path])
+    output_path = get_option("-o")
+    if not task_paths or output_path is None:
+        print("Error: tasks or output file are not specified")
+        sys.exit()
+
+    algorithms = get_option("-algorithms", "sipp,wsipp").split(",")
+    for algorithm in algorithms:
+        if algorithm not in ALGORITHMS:
+            print(f"Error: unknown algorithm {algorithm}")
+            sys.exit()
+
+    weights = [float(weight) for weight in get_option("-weights", ",".join(map(str, DEFAULT_WEIGHTS))).split(",")]
+    workers = get_option("-workers")
+    timeout = get_option("-timeout")
+    run_batch(task_paths, output_path, algorithms, weights, workers=int(workers) if workers else None,
+              timeout=float(timeout) if timeout else None, eager="-eager" in sys.argv,
+              cache_dir=get_option("-cache"), logs_dir=get_option("-logs"),
+              heuristic=get_option("-heuristic", "manhattan"), budget=planner.get_budget(),
+              validate="-validate" in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compares the plain search with the corridor-restricted search (planner.corridor_plan):
+cells whose safe intervals were computed, expansions, wall time (including the
+corridor construction) and path cost. Maps are lazy, so intervals are computed
+only for the cells the search reaches.
+
+Usage:
+    python3 src/benchmarks/bench_corridor.py [task.xml ...] [-widths 2,4,8]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sipp_map import Map
+from instrumentation import Instrumentation
+from heuristics import distance_cache
+import planner
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+DEFAULT_TASKS = ["lak109d_75_0.xml", "den101d_200_1.xml", "den312d_300_3.xml", "lak507d_500_1.xml"]
+
+
+def measure(task_path, width=None):
+    task_map = Map(task_path)
+    instrumentation = Instrumentation()
+    distance_cache.clear()
+    if width is None:
+        result = planner.plan(task_map, instrumentation=instrumentation)
+    else:
+        result = planner.corridor_plan(task_map, width, instrumentation=instrumentation)
+    return result, instrumentation.counters["cells_computed"]
+
+
+def run(task_path, widths):
+    base, base_cells = measure(task_path)
+    print(f"{os.path.basename(task_path):<24} {'plain':>8} cells={base_cells:<8} steps={base.steps:<8} "
+          f"time={base.search_time:7.3f}s cost={base.cost}")
+    for width in widths:
+        result, cells = measure(task_path, width)
+        print(f"{'':<24} {f'width={width}':>8} cells={cells:<8} steps={result.steps:<8} "
+              f"time={result.search_time:7.3f}s cost={result.cost} widened={len(result.attempts) - 1} | "
+              f"cells x{cells / max(base_cells, 1):.2f} steps x{result.steps / max(base.steps, 1):.2f} "
+              f"time x{result.search_time / max(base.search_time, 1e-9):.2f} "
+              f"cost x{result.cost / base.cost if base.found else float('nan'):.3f}")
+
+
+if __name__ == "__main__":
+    widths = [2, 4, 8]
+    if "-widths" in sys.argv:
+        index = sys.argv.index("-widths")
+        widths = [int(width) for width in sys.argv[index + 1].split(",")]
+        del sys.argv[index:index + 2]
+
+    tasks = sys.argv[1:] or [os.path.join(DATA_DIR, task) for task in DEFAULT_TASKS]
+    for task in tasks:
+        run(task, widths)
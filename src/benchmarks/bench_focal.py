@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compares Focal SIPP against WSIPP at the same suboptimality bound:
+expansions, path cost and search time on every task.
+
+Usage:
+    python3 src/benchmarks/bench_focal.py [task.xml ...] [-bounds 1.05,1.1,1.5,2.0]
+"""
+
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sipp_map import Map
+import planner
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+
+
+if __name__ == "__main__":
+    bounds = [1.05, 1.1, 1.5, 2.0]
+    if "-bounds" in sys.argv:
+        index = sys.argv.index("-bounds")
+        bounds = [float(bound) for bound in sys.argv[index + 1].split(",")]
+        del sys.argv[index:index + 2]
+
+    tasks = sys.argv[1:] or sorted(glob.glob(os.path.join(DATA_DIR, "*.xml")))
+    print(f"{'task':<24} {'bound':>6} | {'wsipp steps':>11} {'cost':>7} {'time':>8} | "
+          f"{'focal steps':>11} {'cost':>7} {'time':>8} | {'optimal':>7}")
+    for task in tasks:
+        # Intervals are precomputed so that both searches pay only for the search itself
+        task_map = Map(task, eager=True)
+        optimal = planner.plan(task_map).cost
+        for bound in bounds:
+            wsipp = planner.plan(task_map, bound, "wsipp")
+            focal = planner.plan(task_map, bound, "focal")
+            print(f"{os.path.basename(task):<24} {bound:>6} | {wsipp.steps:>11} {wsipp.cost:>7} "
+                  f"{wsipp.search_time:>7.3f}s | {focal.steps:>11} {focal.cost:>7} {focal.search_time:>7.3f}s | "
+                  f"{optimal:>7}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compares load time and peak memory of the streaming task loader against
+parsing the whole task into a BeautifulSoup tree, as the loader used to do.
+The soup column needs bs4 and lxml and is skipped when they are not installed.
+
+Usage:
+    python3 src/benchmarks/bench_loader.py [task.xml ...] [-repeat N]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from task_loader import load_task
+
+try:
+    from bs4 import BeautifulSoup
+    import lxml  # noqa: F401, the parser of BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+DEFAULT_TASKS = ["lak109d_75_0.xml", "den101d_200_1.xml", "den312d_300_3.xml", "lak507d_500_1.xml"]
+
+
+def load_with_soup(task_path):
+    with open(task_path, 'r') as xml_file:
+        soup = BeautifulSoup(xml_file, "lxml").map
+    grid = [[int(el) for el in row.get_text().split()] for row in soup.grid.find_all("row")]
+    obstacles = [
+        [(int(point["x"]) - 1, int(point["y"]) - 1, int(point["time"])) for point in obstacle.find_all("point")]
+        for obstacle in soup.dynamicobstacles.find_all("obstacle")
+    ]
+    return grid, obstacles
+
+
+def measure(loader, task_path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loader(task_path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    loader(task_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+    repeat = 3
+    if "-repeat" in sys.argv:
+        index = sys.argv.index("-repeat")
+        repeat = int(sys.argv[index + 1])
+        del sys.argv[index:index + 2]
+
+    tasks = sys.argv[1:] or [os.path.join(DATA_DIR, task) for task in DEFAULT_TASKS]
+    if BeautifulSoup is None:
+        print("bs4 or lxml is not installed, only the streaming loader is measured")
+    for task in tasks:
+        stream_time, stream_peak = measure(load_task, task, repeat)
+        if BeautifulSoup is None:
+            print(f"{os.path.basename(task):<24} stream={stream_time:7.3f}s {stream_peak:8.2f}MiB")
+            continue
+        soup_time, soup_peak = measure(load_with_soup, task, repeat)
+        print(f"{os.path.basename(task):<24} soup={soup_time:7.3f}s {soup_peak:8.2f}MiB  "
+              f"stream={stream_time:7.3f}s {stream_peak:8.2f}MiB  "
+              f"speedup={soup_time / stream_time:5.1f}x memory={soup_peak / stream_peak:5.1f}x")
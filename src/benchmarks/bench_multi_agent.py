@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Measures the throughput of prioritized planning (agents per second) for a growing
+number of random agents, and the share of time spent on reserving their paths.
+
+Agents get random distinct start and goal cells of the static component of the
+task goal, with starts free at time 0. With incremental reservations the time per
+agent should stay roughly constant as the number of agents grows.
+
+Usage:
+    python3 src/benchmarks/bench_multi_agent.py [task.xml ...] [-agents 10,20,40] [-eager] [-heuristic manhattan|true]
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sipp_map import Map
+from heuristics import static_distances
+import multi_agent
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+DEFAULT_TASKS = ["den312d_300_3.xml", "lak507d_500_1.xml"]
+
+
+def random_agents(task_map, count, seed=0):
+    """
+    Returns count rows of zero-based (startx, starty, finishx, finishy).
+    """
+    distances = static_distances(task_map.grid, task_map.goal_j, task_map.goal_i)
+    cells = np.argwhere(np.isfinite(distances))
+    rng = np.random.default_rng(seed)
+    cells = cells[rng.permutation(len(cells))]
+
+    starts = []
+    for i, j in cells.tolist():
+        task_map.set_intervals(i, j)
+        if task_map.get_interval_start(i, j, 0) == 0:
+            starts.append((i, j))
+        if len(starts) == count:
+            break
+    taken = set(starts)
+    goals = [cell for cell in map(tuple, cells[::-1].tolist()) if cell not in taken][:count]
+    return np.array([(sj, si, gj, gi) for (si, sj), (gi, gj) in zip(starts, goals)], dtype=np.int64)
+
+
+if __name__ == "__main__":
+    counts = [10, 20, 40]
+    heuristic = "manhattan"
+    if "-agents" in sys.argv:
+        index = sys.argv.index("-agents")
+        counts = [int(count) for count in sys.argv[index + 1].split(",")]
+        del sys.argv[index:index + 2]
+    if "-heuristic" in sys.argv:
+        index = sys.argv.index("-heuristic")
+        heuristic = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+    eager = "-eager" in sys.argv
+    if eager:
+        sys.argv.remove("-eager")
+
+    tasks = sys.argv[1:] or [os.path.join(DATA_DIR, task) for task in DEFAULT_TASKS]
+    for task in tasks:
+        agents = random_agents(Map(task), max(counts))
+        for count in counts:
+            task_map = Map(task, eager=eager)
+            result = multi_agent.plan_agents(task_map, agents[:count], heuristic=heuristic)
+            print(f"{os.path.basename(task):<24} agents={count:<4} planned={result.planned:<4} "
+                  f"time={result.search_time:7.3f}s  agents/s={count / result.search_time:7.1f}  "
+                  f"reserve={result.reserve_time / result.search_time * 100:5.1f}%")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compares Map.set_intervals backed by the per-cell segment index against the
+previous implementation, which scanned every segment of every obstacle.
+
+Usage:
+    python3 src/benchmarks/bench_set_intervals.py [task.xml ...] [-cells N]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sipp_map import Map
+from utils import Interval
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+DEFAULT_TASKS = ["lak109d_75_0.xml", "den101d_200_1.xml", "den312d_300_3.xml", "lak507d_500_1.xml"]
+
+
+class ScanMap(Map):
+    """
+    Map computing collision intervals with a full scan over all obstacle segments.
+    """
+
+    def get_collision_intervals(self, i, j):
+        collision_intervals = []
+        for obstacle in self.dynamic_obstacles:
+            path = obstacle.path
+            for point_i in range(1, len(path)):
+                if not self.point_on_segment((j, i), [path[point_i - 1][0], path[point_i - 1][1]],
+                                             [path[point_i][0], path[point_i][1]]):
+                    continue
+                distance = self.get_distance(i, j, path[point_i - 1][1], path[point_i - 1][0])
+                collision_intervals.append(Interval(False, path[point_i - 1][2] + distance - self.cost / 2,
+                                                    path[point_i - 1][2] + distance + self.cost / 2))
+                if self.get_distance(path[point_i - 1][1], path[point_i - 1][0], path[point_i][1], path[point_i][0]) == 0:
+                    collision_intervals[-1].end_time = path[point_i][2] + self.cost / 2
+        return collision_intervals
+
+
+def sample_cells(task_map, count, seed=0):
+    free = [(i, j) for i in range(task_map.get_height()) for j in range(task_map.get_width())
+            if task_map.is_traversable(i, j)]
+    # Cells crossed by obstacles are the expensive ones, make sure they are represented
+    free_set = set(free)
+    crossed = [cell for cell in task_map.segment_index if cell in free_set]
+    rng = random.Random(seed)
+    cells = rng.sample(crossed, min(len(crossed), count // 2))
+    cells += rng.sample(free, min(len(free), count - len(cells)))
+    return cells
+
+
+def run(task_path, count):
+    indexed, scanned = Map(task_path), ScanMap(task_path)
+    cells = sample_cells(indexed, count)
+
+    start = time.perf_counter()
+    for i, j in cells:
+        indexed.set_intervals(i, j)
+    indexed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, j in cells:
+        scanned.set_intervals(i, j)
+    scanned_time = time.perf_counter() - start
+
+    mismatches = sum(
+        [(x.is_safe, x.start_time, x.end_time) for x in indexed.map[i][j]] !=
+        [(x.is_safe, x.start_time, x.end_time) for x in scanned.map[i][j]]
+        for i, j in cells
+    )
+    print(f"{os.path.basename(task_path):<24} cells={len(cells):<6} obstacles={len(indexed.dynamic_obstacles):<5} "
+          f"scan={scanned_time:8.3f}s index={indexed_time:8.4f}s "
+          f"speedup={scanned_time / max(indexed_time, 1e-9):8.1f}x mismatches={mismatches}")
+
+
+if __name__ == "__main__":
+    count = 500
+    if "-cells" in sys.argv:
+        index = sys.argv.index("-cells")
+        count = int(sys.argv[index + 1])
+        del sys.argv[index:index + 2]
+
+    tasks = sys.argv[1:] or [os.path.join(DATA_DIR, task) for task in DEFAULT_TASKS]
+    for task in tasks:
+        run(task, count)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Benchmark and regression suite.
+
+Runs every task of data/ (and any extra tasks or directories given, e.g. generated
+ones) several times and writes a JSON report with load and search times, expansions,
+created nodes, peak memory, path length and cost of every task, keyed by the path of
+the task relative to the repository root. Path length and cost are checked against
+the stored logs/log_<task>.xml when there is one.
+
+Two reports are compared with -compare: times and memory that grew by more than the
+threshold (relative), any growth of expansions and any change of the path cost are
+flagged as regressions (time changes below MIN_TIME_CHANGE are ignored), and the
+exit code is 1 if there are any.
+
+Usage:
+    python3 src/benchmarks/bench_suite.py [task.xml | tasks_dir ...] [-o report.json] [-repeat N]
+        [-a sipp|wsipp|focal|anytime] [-w weight] [-heuristic manhattan|true] [-eager] [-compact]
+    python3 src/benchmarks/bench_suite.py -compare old.json new.json [-threshold 0.1]
+"""
+
+from typing import Dict, List, Optional
+import datetime
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sipp_map import Map
+from task_loader import load_task
+import planner
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+LOGS_DIR = os.path.join(ROOT_DIR, "logs")
+
+# Metrics compared between reports: name -> whether any growth (True) or growth above the threshold is a regression
+COMPARED = {
+    "load_time": False,
+    "search_time": False,
+    "peak_memory_mib": False,
+    "expansions": True,
+}
+# Changes of times below this many seconds are noise
+MIN_TIME_CHANGE = 0.001
+
+
+def read_reference(task_path: str) -> Optional[Dict[str, float]]:
+    """
+    Returns the path length and cost of the stored log of the task, if there is one.
+    """
+    name = os.path.splitext(os.path.basename(task_path))[0]
+    log_path = os.path.join(LOGS_DIR, f"log_{name}.xml")
+    if not os.path.exists(log_path):
+        return None
+    log = load_task(log_path)
+    if log.summary is None or log.path_points is None:
+        return None
+    cost = float(log.path_points[-1, 2]) if len(log.path_points) else 0.0
+    return {"path_length": int(log.summary["pathlength"]), "cost": cost}
+
+
+def run_once(task_path: str, options: dict):
+    start = time.perf_counter()
+    task_map = Map(task_path, eager=options["eager"])
+    load_time = time.perf_counter() - start
+    result = planner.plan(task_map, options["weight"], options["algorithm"], compact=options["compact"],
+                          heuristic=options["heuristic"])
+    return load_time, result
+
+
+def bench_task(task_path: str, repeat: int, options: dict) -> dict:
+    load_times, search_times = [], []
+    for _ in range(repeat):
+        load_time, result = run_once(task_path, options)
+        load_times.append(load_time)
+        search_times.append(result.search_time)
+
+    tracemalloc.start()
+    run_once(task_path, options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    record = {
+        "status": result.status,
+        "load_time": statistics.median(load_times),
+        "load_time_min": min(load_times),
+        "search_time": statistics.median(search_times),
+        "search_time_min": min(search_times),
+        "expansions": result.steps,
+        "nodes_created": result.nodes_created,
+        "peak_memory_mib": peak / 2 ** 20,
+        "path_length": len(result.path),
+        "cost": float(result.cost),
+    }
+    reference = read_reference(task_path)
+    # The reference logs hold optimal paths, so only the unweighted sipp is compared with them
+    if reference is None or options["algorithm"] != "sipp" or float(options["weight"]) != 1.0:
+        record["check"] = "no reference"
+    elif reference["path_length"] == record["path_length"] and reference["cost"] == record["cost"]:
+        record["check"] = "ok"
+    else:
+        record["check"] = f"mismatch: expected path length {reference['path_length']} and cost {reference['cost']}"
+    return record
+
+
+def task_name(task_path: str) -> str:
+    """
+    Key of the task in the report: its path relative to the repository root, so tasks with
+    the same file name in different directories differ, and the keys of data/ tasks do not
+    depend on the extra tasks given.
+    """
+    return os.path.relpath(os.path.abspath(task_path), os.path.abspath(ROOT_DIR))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(task_paths: List[str], repeat: int, options: dict) -> dict:
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            **options,
+        },
+        "tasks": {},
+    }
+    for task_path in task_paths:
+        record = bench_task(task_path, repeat, options)
+        name = task_name(task_path)
+        report["tasks"][name] = record
+        print(f"{name:<24} load={record['load_time']:7.3f}s "
+              f"search={record['search_time']:7.3f}s expansions={record['expansions']:<7} memory={record['peak_memory_mib']:7.2f}MiB "
+              f"cost={record['cost']:<6} {record['check']}")
+    return report
+
+
+def compare_reports(old: dict, new: dict, threshold: float) -> List[str]:
+    """
+    Prints the relative change of the compared metrics of every task and returns the regressions.
+    """
+    regressions = []
+    for task, new_record in new["tasks"].items():
+        old_record = old["tasks"].get(task)
+        if old_record is None:
+            print(f"{task:<24} new task")
+            continue
+
+        changes = []
+        for metric, any_growth in COMPARED.items():
+            before, after = old_record[metric], new_record[metric]
+            change = (after - before) / before if before else 0.0
+            changes.append(f"{metric}={change * 100:+6.1f}%")
+            if metric.endswith("_time") and after - before < MIN_TIME_CHANGE:
+                continue
+            if (any_growth and after > before) or (not any_growth and change > threshold):
+                regressions.append(f"{task}: {metric} {before:.6g} -> {after:.6g} ({change * 100:+.1f}%)")
+        if old_record["cost"] != new_record["cost"]:
+            regressions.append(f"{task}: cost {old_record['cost']} -> {new_record['cost']}")
+        if new_record["check"] not in ("ok", "no reference"):
+            regressions.append(f"{task}: {new_record['check']}")
+        print(f"{task:<24} " + " ".join(changes))
+    return regressions
+
+
+def get_option(name: str, default=None):
+    if name not in sys.argv:
+        return default
+    index = sys.argv.index(name)
+    if index + 1 >= len(sys.argv):
+        return default
+    return sys.argv[index + 1]
+
+
+def main():
+    if "-compare" in sys.argv:
+        index = sys.argv.index("-compare")
+        if index + 2 >= len(sys.argv):
+            print("Error: two reports are needed for comparison")
+            sys.exit(2)
+        with open(sys.argv[index + 1]) as f:
+            old = json.load(f)
+        with open(sys.argv[index + 2]) as f:
+            new = json.load(f)
+        regressions = compare_reports(old, new, float(get_option("-threshold", 0.1)))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+    options = {"-o", "-repeat", "-a", "-w", "-heuristic"}
+    paths, skip = [], False
+    for arg in sys.argv[1:]:
+        if skip:
+            skip = False
+        elif arg in options:
+            skip = True
+        elif not arg.startswith("-"):
+            paths.append(arg)
+
+    task_paths = sorted(glob.glob(os.path.join(DATA_DIR, "*.xml")))
+    for path in paths:
+        task_paths.extend(sorted(glob.glob(os.path.join(path, "*.xml"))) if os.path.isdir(path) else [path])
+
+    run_options = {
+        "algorithm": get_option("-a", "sipp"),
+        "weight": float(get_option("-w", 1.0)),
+        "heuristic": get_option("-heuristic", "manhattan"),
+        "eager": "-eager" in sys.argv,
+        "compact": "-compact" in sys.argv,
+    }
+    report = run_suite(task_paths, int(get_option("-repeat", 3)), run_options)
+    output_path = get_option("-o", "bench_report.json")
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"-> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
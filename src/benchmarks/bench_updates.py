@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compares incremental obstacle updates followed by replan() against reloading the
+task and planning from scratch after every update.
+
+Every update delays a random obstacle by a few time units (replace) or adds a
+delayed copy of one (add). Reloading is timed on the original task file, which
+takes as long to parse as a file with the updated trajectories; the updates are
+then replayed untimed on the reloaded map to check that both give the same cost.
+reused counts the updates answered without a search, expansions compares the
+expansions of replan() with those of planning from scratch.
+
+Every task is run with lazy and with eager safe intervals, -lazy or -eager keeps
+only one of them. An eager map recomputes the intervals of the touched cells only,
+and a reload recomputes them for the whole grid.
+
+Usage:
+    python3 src/benchmarks/bench_updates.py [task.xml ...] [-updates N] [-lazy | -eager]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sipp_map import Map
+import planner
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+DEFAULT_TASKS = ["lak109d_75_0.xml", "den101d_200_1.xml", "den312d_300_3.xml", "lak507d_500_1.xml"]
+
+
+def make_updates(task_map, count, seed=0):
+    """
+    Returns a list of (operation, obstacle id, path) updates.
+    """
+    rng = random.Random(seed)
+    paths = [[(x, y, t // task_map.cost) for x, y, t in obstacle.path] for obstacle in task_map.dynamic_obstacles]
+    updates = []
+    for _ in range(count):
+        obstacle_id = rng.randrange(len(paths))
+        delay = rng.randint(1, 5)
+        path = [(x, y, t + delay) for x, y, t in paths[obstacle_id]]
+        if rng.random() < 0.5:
+            paths[obstacle_id] = path
+            updates.append(("replace", obstacle_id, path))
+        else:
+            paths.append(path)
+            updates.append(("add", None, path))
+    return updates
+
+
+def apply_update(task_map, update):
+    operation, obstacle_id, path = update
+    if operation == "add":
+        return task_map.add_obstacle(path)
+    return task_map.replace_obstacle(obstacle_id, path)
+
+
+def run(task_path, count, eager):
+    task_map = Map(task_path, eager=eager)
+    result = planner.plan(task_map)
+    updates = make_updates(task_map, count)
+
+    incremental = reload = 0.0
+    reused = expansions = fresh_expansions = 0
+    for index, update in enumerate(updates):
+        start = time.perf_counter()
+        change = apply_update(task_map, update)
+        result = planner.replan(task_map, result, [change])
+        incremental += time.perf_counter() - start
+        reused += result.steps == 0
+        expansions += result.steps
+
+        start = time.perf_counter()
+        fresh_map = Map(task_path, eager=eager)
+        reload += time.perf_counter() - start
+        for previous in updates[:index + 1]:
+            apply_update(fresh_map, previous)
+        start = time.perf_counter()
+        fresh = planner.plan(fresh_map)
+        reload += time.perf_counter() - start
+        fresh_expansions += fresh.steps
+        if fresh.cost != result.cost:
+            raise RuntimeError(f"cost mismatch after update {index}: {result.cost} != {fresh.cost}")
+    return incremental / count, reload / count, reused, expansions, fresh_expansions
+
+
+if __name__ == "__main__":
+    count = 20
+    if "-updates" in sys.argv:
+        index = sys.argv.index("-updates")
+        count = int(sys.argv[index + 1])
+        del sys.argv[index:index + 2]
+    modes = [False, True]
+    if "-eager" in sys.argv:
+        sys.argv.remove("-eager")
+        modes = [True]
+    elif "-lazy" in sys.argv:
+        sys.argv.remove("-lazy")
+        modes = [False]
+
+    tasks = sys.argv[1:] or [os.path.join(DATA_DIR, task) for task in DEFAULT_TASKS]
+    for task in tasks:
+        for eager in modes:
+            incremental, reload, reused, expansions, fresh_expansions = run(task, count, eager)
+            print(f"{os.path.basename(task):<24} {'eager' if eager else 'lazy':<5}  "
+                  f"incremental={incremental * 1000:8.2f}ms  reload={reload * 1000:8.2f}ms  "
+                  f"speedup={reload / incremental:6.1f}x  reused={reused}/{count}  "
+                  f"expansions={expansions}/{fresh_expansions}")
@@ -0,0 +1,90 @@
+"""
+Corridor restriction of the search.
+
+A corridor is the set of free cells within a given static distance (the width)
+of one static shortest path from the start to the goal. While a corridor is
+attached to a map, is_traversable of the map instance accepts only its cells,
+so the search neither expands nor computes safe intervals outside of it.
+Distances to the path are computed with a breadth-first search cut at the width,
+so building a narrow corridor on a large grid costs only the cells around the
+path. Once the corridor holds the whole static connected component of the start,
+it restricts nothing, so a search widening it until then stays complete.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from heuristics import distances_from_cells
+
+
+def static_path(distances: np.ndarray, start_i: int, start_j: int) -> np.ndarray:
+    """
+    Flat indices of the cells of a shortest path from the start down the static
+    distances to the goal, empty if the goal is not reachable.
+    """
+    height, width = distances.shape
+    if not np.isfinite(distances[start_i, start_j]):
+        return np.empty(0, dtype=np.int64)
+    i, j = start_i, start_j
+    cells = [i * width + j]
+    while distances[i, j] > 0:
+        for ni, nj in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+            if 0 <= ni < height and 0 <= nj < width and distances[ni, nj] == distances[i, j] - 1:
+                i, j = ni, nj
+                break
+        cells.append(i * width + j)
+    return np.array(cells, dtype=np.int64)
+
+
+class Corridor:
+    """
+    Cells within width of a static shortest path between (row, column) start and goal.
+
+    Attributes
+    ----------
+    width : int
+        Maximum static distance of a corridor cell to the path.
+    path : np.ndarray
+        Flat indices of the cells of the static path.
+    mask : np.ndarray
+        Cells of the corridor, shape (height, width).
+    complete : bool
+        Whether the corridor holds every cell reachable from the path, so it restricts nothing.
+    """
+
+    def __init__(self, grid: np.ndarray, start: Tuple[int, int], goal: Tuple[int, int], width: int):
+        self.grid = grid
+        columns = grid.shape[1]
+        to_goal = distances_from_cells(grid, [goal[0] * columns + goal[1]], target=start[0] * columns + start[1])
+        self.path = static_path(to_goal, *start)
+        self.set_width(width)
+
+    def set_width(self, width: int):
+        self.width = width
+        if not len(self.path):
+            # Without a static path there is nothing to find, and nothing to prune
+            self.mask, self.complete = ~self.grid, True
+            return
+        # One more layer tells whether the corridor reached the border of the component
+        distances = distances_from_cells(self.grid, self.path, max_distance=width + 1)
+        self.mask = distances <= width
+        self.complete = not (distances == width + 1).any()
+
+    @property
+    def cells(self) -> int:
+        return int(self.mask.sum())
+
+    def widen(self, factor: int = 2):
+        self.set_width(max(self.width * factor, self.width + 1))
+
+    def attach(self, task_map):
+        """
+        Restricts is_traversable of the map instance to the corridor until detach.
+        """
+        mask = self.mask
+        task_map.is_traversable = lambda i, j: mask[i, j]
+
+    @staticmethod
+    def detach(task_map):
+        task_map.__dict__.pop("is_traversable", None)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+One-to-all earliest arrival: a single SIPP search from one start without a goal
+test (Dijkstra over the safe interval states). It stops once every cell of the
+static connected component of the start, or every given goal cell, is reached,
+and otherwise settles every reachable state.
+
+The first settled state of a cell gives its earliest arrival time. Settled states
+are stored in the order they were settled as flat arrays of their cell, arrival
+time and parent state; the parent of a state may be a later interval of its
+parent cell, so parents are kept per state and not per cell. Intervals of a cell
+get their state slots when the cell is first reached (the CSR slots of an eager
+map), so the search keeps its bookkeeping in NumPy arrays instead of dictionaries.
+
+Usage:
+    python3 src/flood.py task.xml [-start x y] [-goals x,y;x,y;...] [-eager] [-o arrival.npz]
+"""
+
+from typing import Iterable, List, Optional, Tuple
+from array import array
+from heapq import heappop, heappush
+import sys
+import time
+
+import numpy as np
+
+from node import Node
+from sipp_map import Map
+from heuristics import static_distances
+import planner
+
+
+class ArrivalResult:
+    """
+    Result of earliest_arrival.
+
+    Attributes
+    ----------
+    arrival : np.ndarray
+        Earliest arrival time of every cell, shape (height, width), inf for unreached cells.
+    cell_states : np.ndarray
+        Settled state of the earliest arrival of every cell, shape (height, width), -1 for unreached cells.
+    state_cells : np.ndarray
+        Cell i * width + j of every settled state.
+    state_times : np.ndarray
+        Arrival time of every settled state.
+    state_parents : np.ndarray
+        Parent state of every settled state, -1 for the start.
+    steps : int
+        Number of settled states.
+    search_time : float
+        Wall time of the search, in seconds.
+    budget_exhausted : bool
+        Whether the search was stopped by its budget.
+    """
+
+    def __init__(self, arrival: np.ndarray, cell_states: np.ndarray, state_cells: np.ndarray,
+                 state_times: np.ndarray, state_parents: np.ndarray, search_time: float,
+                 budget_exhausted: bool = False):
+        self.arrival = arrival
+        self.cell_states = cell_states
+        self.state_cells = state_cells
+        self.state_times = state_times
+        self.state_parents = state_parents
+        self.search_time = search_time
+        self.budget_exhausted = budget_exhausted
+
+    @property
+    def steps(self) -> int:
+        return len(self.state_cells)
+
+    @property
+    def reached(self) -> int:
+        return int((self.cell_states >= 0).sum())
+
+    def path(self, i: int, j: int) -> List[Node]:
+        """
+        Path of the earliest arrival at the cell (i, j) in the form of SearchResult.path,
+        empty if the cell was not reached.
+        """
+        state = int(self.cell_states[i, j])
+        if state < 0:
+            return []
+        width = self.arrival.shape[1]
+        node = None
+        states = []
+        while state >= 0:
+            states.append(state)
+            state = int(self.state_parents[state])
+        for state in reversed(states):
+            cell = int(self.state_cells[state])
+            node = Node(cell // width, cell % width, 0, g=float(self.state_times[state]), parent=node)
+        return planner.fill_waits(planner.make_path(node))
+
+    def save(self, path: str):
+        np.savez_compressed(path, arrival=self.arrival, cell_states=self.cell_states, state_cells=self.state_cells,
+                            state_times=self.state_times, state_parents=self.state_parents)
+
+
+def earliest_arrival(task_map: Map, start: Optional[Tuple[int, int]] = None,
+                     goals: Optional[Iterable[Tuple[int, int]]] = None,
+                     budget: Optional[planner.Budget] = None) -> ArrivalResult:
+    """
+    Earliest arrival times from the start of the task, or the given (row, column) start,
+    to every reachable cell, or only until all the given goal cells are reached.
+    """
+    start_time = time.perf_counter()
+    start_i, start_j = start if start is not None else (task_map.start_j, task_map.start_i)
+    goals = list(goals) if goals is not None else []
+    planner.check_cells(task_map, (start_i, start_j), *goals)
+
+    height, width = task_map.get_height(), task_map.get_width()
+    arrival = np.full((height, width), np.inf)
+    cell_states = np.full((height, width), -1, dtype=np.int64)
+    flat_arrival, flat_states = arrival.reshape(-1), cell_states.reshape(-1)
+
+    # Once all the targets are reached, the remaining states cannot give an earlier arrival at any cell
+    if goals:
+        targets = np.zeros(height * width, dtype=np.bool_)
+        targets[[i * width + j for i, j in goals]] = True
+    else:
+        targets = np.isfinite(static_distances(task_map.grid, start_i, start_j)).reshape(-1)
+    remaining = int(targets.sum())
+
+    # State slots: intervals of a cell get consecutive slots when the cell is first reached
+    bases = np.full(height * width, -1, dtype=np.int64)
+    best = np.full(max(height * width, 1), np.inf)  # Best pushed arrival of every slot
+    settled = np.zeros(len(best), dtype=np.bool_)
+    next_base = 0
+
+    def slot(i, j, interval):
+        nonlocal best, settled, next_base
+        cell = i * width + j
+        base = bases[cell]
+        if base < 0:
+            count = task_map.get_intervals_count(i, j)
+            base = bases[cell] = next_base
+            next_base += count
+            if next_base > len(best):
+                size = max(next_base, 2 * len(best))
+                best = np.concatenate((best, np.full(size - len(best), np.inf)))
+                settled = np.concatenate((settled, np.zeros(size - len(settled), dtype=np.bool_)))
+        return base + interval
+
+    state_cells, state_times, state_parents = array("q"), array("d"), array("q")
+    task_map.set_intervals(start_i, start_j)
+    opened = [(0, 0, start_i, start_j, 0, -1)]
+    counter = 0
+    stopped = False
+
+    while opened:
+        if budget is not None and budget.exhausted(len(state_cells), len(opened), time.perf_counter() - start_time):
+            stopped = True
+            break
+        g, _, i, j, interval, parent = heappop(opened)
+        key = slot(i, j, interval)
+        if settled[key]:
+            continue
+        settled[key] = True
+        state = len(state_cells)
+        cell = i * width + j
+        state_cells.append(cell)
+        state_times.append(g)
+        state_parents.append(parent)
+        if flat_states[cell] < 0:
+            flat_states[cell] = state
+            flat_arrival[cell] = g
+            if targets[cell]:
+                remaining -= 1
+                if not remaining:
+                    break
+
+        for ni, nj, cost1, cost2, ninterval in task_map.get_successors(Node(i, j, interval, g=g)):
+            new_g = max(g + cost1, cost2)
+            new_key = slot(ni, nj, ninterval)
+            if settled[new_key] or best[new_key] <= new_g:
+                continue
+            best[new_key] = new_g
+            counter += 1
+            heappush(opened, (new_g, counter, ni, nj, ninterval, state))
+
+    return ArrivalResult(arrival, cell_states, np.frombuffer(state_cells, dtype=np.int64),
+                         np.frombuffer(state_times, dtype=np.float64), np.frombuffer(state_parents, dtype=np.int64),
+                         time.perf_counter() - start_time, stopped)
+
+
+def parse_goals(text: str) -> List[Tuple[int, int]]:
+    """
+    Parses goals given as 1-based x,y pairs separated by semicolons into (row, column) cells.
+    """
+    goals = []
+    for item in text.split(";"):
+        x, y = item.split(",")
+        goals.append((int(y) - 1, int(x) - 1))
+    return goals
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Error: input file is not specified")
+        sys.exit()
+
+    task_path = sys.argv[1]
+    try:
+        task_map = Map(task_path, eager="-eager" in sys.argv)
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"Invalid input file: {e}")
+        sys.exit()
+
+    try:
+        start = None
+        if "-start" in sys.argv:
+            index = sys.argv.index("-start")
+            start = (int(sys.argv[index + 2]) - 1, int(sys.argv[index + 1]) - 1)
+        goals = parse_goals(planner.get_option("-goals")) if "-goals" in sys.argv else None
+        result = earliest_arrival(task_map, start, goals, budget=planner.get_budget())
+    except (IndexError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit()
+
+    print(f"reached={result.reached} states={result.steps} searchtime={result.search_time:.3f}s")
+    for i, j in goals or [(task_map.goal_j, task_map.goal_i)]:
+        print(f"x={j + 1} y={i + 1} arrival={result.arrival[i, j]}")
+
+    output_path = planner.get_option("-o")
+    if output_path is not None:
+        result.save(output_path)
+        print(f"-> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Synthetic task generator.
+
+Takes the static grid from a MovingAI .map file or an existing task, or creates a
+random or maze grid, picks the agent start and finish in one connected component
+and moves dynamic obstacles along random walks: at every time step an obstacle
+waits with probability wait, otherwise it keeps its direction with probability
+straight or turns to a random one, and it waits instead if the move is blocked.
+All obstacles are moved together with NumPy operations, one time step at a time,
+and collinear moves and consecutive waits are merged into single path segments.
+As in the tasks of data/, obstacles stay at their last cell forever unless -no-park
+is given.
+
+Usage:
+    python3 src/generator.py -o task.xml [-grid random|maze|file.map|task.xml] [-size WxH] [-fill 0.2]
+        [-obstacles N | -density d] [-steps L] [-wait 0.2] [-straight 0.7] [-seed S] [-no-park]
+"""
+
+from typing import Optional, Tuple
+import sys
+
+import numpy as np
+
+from task_loader import Task, load_task, _validate_obstacles
+from heuristics import static_distances
+from sipp_map import INF
+
+# Moves of the obstacles as (dx, dy); index 4 is a wait
+MOVES = np.array([[1, 0], [-1, 0], [0, 1], [0, -1], [0, 0]], dtype=np.int64)
+WAIT = 4
+
+
+def load_movingai_map(map_path: str) -> np.ndarray:
+    """
+    Reads a grid in the MovingAI format, where '.', 'G' and 'S' are free cells.
+    """
+    with open(map_path, 'r') as f:
+        lines = f.read().splitlines()
+    header = {}
+    index = 0
+    while index < len(lines) and lines[index].strip() != "map":
+        parts = lines[index].split()
+        if len(parts) == 2:
+            header[parts[0]] = parts[1]
+        index += 1
+    try:
+        height, width = int(header["height"]), int(header["width"])
+    except (KeyError, ValueError):
+        raise ValueError("ERROR: invalid MovingAI map header")
+    rows = lines[index + 1:index + 1 + height]
+    if len(rows) != height or any(len(row) < width for row in rows):
+        raise ValueError("ERROR: invalid MovingAI map grid")
+    cells = np.frombuffer("".join(row[:width] for row in rows).encode(), dtype=np.uint8).reshape(height, width)
+    return ~np.isin(cells, np.frombuffer(b".GS", dtype=np.uint8))
+
+
+def random_grid(width: int, height: int, fill: float, rng: np.random.Generator) -> np.ndarray:
+    return rng.random((height, width)) < fill
+
+
+def maze_grid(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Binary tree maze: cells with even coordinates are rooms, and every room opens
+    the wall to its right or below at random (rooms on the last row or column open
+    the only possible wall).
+    """
+    grid = np.ones((height, width), dtype=np.bool_)
+    rows, columns = np.meshgrid(np.arange(0, height, 2), np.arange(0, width, 2), indexing="ij")
+    grid[rows, columns] = False
+    can_right = columns + 2 < width
+    can_down = rows + 2 < height
+    right = np.where(can_right & can_down, rng.random(rows.shape) < 0.5, can_right)
+    down = can_down & ~right
+    grid[rows[right], columns[right] + 1] = False
+    grid[rows[down] + 1, columns[down]] = False
+    return grid
+
+
+def pick_endpoints(grid: np.ndarray, rng: np.random.Generator) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """
+    Picks the zero-based (x, y) of the agent start and finish: a random free cell and a
+    random cell of its connected component at least at the median distance from it.
+    Isolated free cells are dropped from the candidate starts as they are drawn.
+    """
+    free = np.argwhere(~grid)
+    if len(free) < 2:
+        raise ValueError("ERROR: the grid has less than two free cells")
+    while True:
+        if not len(free):
+            raise ValueError("ERROR: no free component with two cells")
+        index = rng.integers(len(free))
+        start_i, start_j = free[index]
+        distances = static_distances(grid, start_i, start_j)
+        reachable = np.isfinite(distances) & (distances > 0)
+        if reachable.any():
+            break
+        free = np.delete(free, index, axis=0)
+    far = reachable & (distances >= np.median(distances[reachable]))
+    candidates = np.argwhere(far)
+    finish_i, finish_j = candidates[rng.integers(len(candidates))]
+    return (int(start_j), int(start_i)), (int(finish_j), int(finish_i))
+
+
+def random_walks(grid: np.ndarray, count: int, steps: int, wait: float, straight: float,
+                 rng: np.random.Generator, exclude=()) -> np.ndarray:
+    """
+    Returns the positions of count random walks over the free cells as an array of
+    shape (steps + 1, count, 2) of zero-based (x, y).
+    """
+    height, width = grid.shape
+    free = np.argwhere(~grid)[:, ::-1]
+    if exclude:
+        excluded = np.array(exclude)
+        free = free[~((free[:, None, :] == excluded[None, :, :]).all(axis=2).any(axis=1))]
+    positions = np.empty((steps + 1, count, 2), dtype=np.int64)
+    positions[0] = free[rng.integers(len(free), size=count)]
+    direction = rng.integers(4, size=count)
+    for step in range(steps):
+        direction = np.where(rng.random(count) < straight, direction, rng.integers(4, size=count))
+        target = positions[step] + MOVES[direction]
+        inside = (target[:, 0] >= 0) & (target[:, 0] < width) & (target[:, 1] >= 0) & (target[:, 1] < height)
+        movable = inside & (rng.random(count) >= wait)
+        movable[movable] = ~grid[target[movable, 1], target[movable, 0]]
+        positions[step + 1] = np.where(movable[:, None], target, positions[step])
+    return positions
+
+
+def compress_walks(positions: np.ndarray, park: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turns walks of shape (steps + 1, count, 2) into obstacle points and offsets in the
+    layout of Task: a point is kept where the kind of the move (direction or wait) changes.
+    """
+    walks = positions.transpose(1, 0, 2)
+    delta = np.diff(walks, axis=1)
+    kind = np.full(delta.shape[:2], WAIT, dtype=np.int64)
+    for move in range(4):
+        kind[(delta == MOVES[move]).all(axis=2)] = move
+    keep = np.ones(walks.shape[:2], dtype=np.bool_)
+    keep[:, 1:-1] = kind[:, 1:] != kind[:, :-1]
+
+    obstacle_ids, times = np.nonzero(keep)
+    points = np.column_stack((walks[obstacle_ids, times], times))
+    counts = keep.sum(axis=1)
+    if park:
+        last = np.cumsum(counts) - 1
+        parked = points[last].copy()
+        parked[:, 2] = INF
+        points = np.insert(points, last + 1, parked, axis=0)
+        counts += 1
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return points, offsets
+
+
+def generate_task(grid: np.ndarray, obstacles: int, steps: int = 200, wait: float = 0.2, straight: float = 0.7,
+                  park: bool = True, seed: Optional[int] = None) -> Task:
+    rng = np.random.default_rng(seed)
+    task = Task()
+    task.height, task.width = grid.shape
+    task.grid = grid.astype(np.bool_)
+    task.start, task.finish = pick_endpoints(task.grid, rng)
+    positions = random_walks(task.grid, obstacles, steps, wait, straight, rng, exclude=(task.start, task.finish))
+    task.obstacle_points, task.obstacle_offsets = compress_walks(positions, park)
+    _validate_obstacles(task.obstacle_points, task.obstacle_offsets)
+    return task
+
+
+def write_task(task: Task, task_path: str):
+    """
+    Writes the task in the XML format of data/.
+    """
+    rows = np.full((task.height, 2 * task.width), ord(' '), dtype=np.uint8)
+    rows[:, 0::2] = task.grid.astype(np.uint8) + ord('0')
+    rows[:, -1] = ord('\n')
+
+    with open(task_path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<root>\n    <map>\n')
+        f.write(f"        <width>{task.width}</width>\n        <height>{task.height}</height>\n")
+        f.write(f"        <startx>{task.start[0] + 1}</startx>\n        <starty>{task.start[1] + 1}</starty>\n")
+        f.write(f"        <finishx>{task.finish[0] + 1}</finishx>\n        <finishy>{task.finish[1] + 1}</finishy>\n")
+        f.write("        <grid>\n")
+        for row in rows:
+            f.write(f"            <row>{row[:-1].tobytes().decode()}</row>\n")
+        f.write("        </grid>\n        <dynamicobstacles>\n")
+        points = task.obstacle_points.tolist()
+        for obstacle_id in range(task.obstacles_count):
+            f.write(f"            <obstacle id=\"{obstacle_id}\">\n")
+            begin, end = task.obstacle_offsets[obstacle_id], task.obstacle_offsets[obstacle_id + 1]
+            f.write("".join(f"                <point x=\"{x + 1}\" y=\"{y + 1}\" time=\"{t}\"/>\n"
+                            for x, y, t in points[begin:end]))
+            f.write("            </obstacle>\n")
+        f.write("        </dynamicobstacles>\n    </map>\n</root>\n")
+
+
+def get_option(name: str, default=None):
+    if name not in sys.argv:
+        return default
+    index = sys.argv.index(name)
+    if index + 1 >= len(sys.argv):
+        return default
+    return sys.argv[index + 1]
+
+
+def main():
+    output_path = get_option("-o")
+    if output_path is None:
+        print("Error: output file is not specified")
+        sys.exit()
+
+    seed = get_option("-seed")
+    rng = np.random.default_rng(int(seed) if seed is not None else None)
+    source = get_option("-grid", "random")
+    try:
+        width, height = (int(value) for value in get_option("-size", "256x256").lower().split("x"))
+        if source == "random":
+            grid = random_grid(width, height, float(get_option("-fill", 0.2)), rng)
+        elif source == "maze":
+            grid = maze_grid(width, height, rng)
+        elif source.endswith(".map"):
+            grid = load_movingai_map(source)
+        else:
+            grid = load_task(source).grid
+
+        free_cells = int((~grid).sum())
+        density = get_option("-density")
+        obstacles = int(float(density) * free_cells) if density is not None else int(get_option("-obstacles", 200))
+        task = generate_task(grid, obstacles, int(get_option("-steps", 200)), float(get_option("-wait", 0.2)),
+                             float(get_option("-straight", 0.7)), "-no-park" not in sys.argv,
+                             int(rng.integers(2 ** 32)))
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"Error: {e}")
+        sys.exit()
+
+    write_task(task, output_path)
+    print(f"{task.width}x{task.height} obstacles={task.obstacles_count} points={len(task.obstacle_points)} "
+          f"start={task.start} finish={task.finish} -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
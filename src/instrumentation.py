@@ -0,0 +1,148 @@
+"""
+Opt-in instrumentation of the planner.
+
+An Instrumentation object wraps the hot methods of one Map instance and of the
+search trees it creates with timing and counting wrappers. Nothing is wrapped
+unless an Instrumentation is passed to planner.plan(), so the search runs the
+plain methods when instrumentation is disabled.
+
+Timers are inclusive: get_successors includes the set_intervals and
+get_safe_interval_id calls made from it.
+"""
+
+from typing import Callable, Dict, List
+import json
+import time
+
+
+MAP_METHODS = ("set_intervals", "get_successors", "get_safe_interval_id")
+
+
+class Instrumentation:
+    """
+    Per-phase timers, counters and peak sizes of the search tree.
+
+    Attributes
+    ----------
+    timers : dict[str, list[float | int]]
+        Phase name -> [total seconds, number of calls].
+    counters : dict[str, int]
+        cells_computed: cells whose safe intervals were computed,
+        intervals_computed: total number of safe intervals of these cells,
+        successors: successors generated, stale_pops and avoided_pushes: duplicates
+        met by the search tree, expansions: iterations of the search loop.
+    peaks : dict[str, int]
+        Maximum sizes of OPEN and CLOSED.
+    """
+
+    def __init__(self):
+        self.timers: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {"cells_computed": 0, "intervals_computed": 0, "successors": 0}
+        self.peaks: Dict[str, int] = {"open": 0, "closed": 0}
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += seconds
+        timer[1] += calls
+
+    def timed(self, name: str, func: Callable) -> Callable:
+        timer = self.timers.setdefault(name, [0.0, 0])
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer[0] += time.perf_counter() - start
+                timer[1] += 1
+
+        return wrapper
+
+    def attach_map(self, task_map):
+        """
+        Wraps the hot methods of the map instance. The previous methods are restored by detach_map.
+        """
+        set_intervals = task_map.set_intervals
+        get_successors = task_map.get_successors
+        counters = self.counters
+
+        def counting_set_intervals(i, j):
+            if task_map.eager or task_map.map[i][j]:
+                return set_intervals(i, j)
+            set_intervals(i, j)
+            counters["cells_computed"] += 1
+            counters["intervals_computed"] += len(task_map.map[i][j])
+
+        def counting_get_successors(node):
+            successors = get_successors(node)
+            counters["successors"] += len(successors)
+            return successors
+
+        task_map.set_intervals = self.timed("set_intervals", counting_set_intervals)
+        task_map.get_successors = self.timed("get_successors", counting_get_successors)
+        task_map.get_safe_interval_id = self.timed("get_safe_interval_id", task_map.get_safe_interval_id)
+
+    @staticmethod
+    def detach_map(task_map):
+        for name in MAP_METHODS:
+            task_map.__dict__.pop(name, None)
+
+    def tree_factory(self, search_tree: Callable) -> Callable:
+        """
+        Returns a factory of search trees whose methods are timed and whose OPEN and CLOSED sizes are tracked.
+        """
+        peaks = self.peaks
+
+        def factory():
+            tree = search_tree()
+            add_to_open = tree.add_to_open
+            add_to_closed = tree.add_to_closed
+
+            def tracking_add_to_open(item):
+                add_to_open(item)
+                peaks["open"] = max(peaks["open"], tree.open_size)
+
+            def tracking_add_to_closed(item):
+                add_to_closed(item)
+                peaks["closed"] = max(peaks["closed"], tree.closed_size)
+
+            tree.add_to_open = self.timed("add_to_open", tracking_add_to_open)
+            tree.add_to_closed = self.timed("add_to_closed", tracking_add_to_closed)
+            tree.get_best_node_from_open = self.timed("get_best_node_from_open", tree.get_best_node_from_open)
+            tree.was_expanded = self.timed("was_expanded", tree.was_expanded)
+            return tree
+
+        return factory
+
+    def record_result(self, result):
+        self.add_time("search", result.search_time)
+        self.counters["expansions"] = self.counters.get("expansions", 0) + result.steps
+        self.counters["stale_pops"] = self.counters.get("stale_pops", 0) + result.stale_pops
+        self.counters["avoided_pushes"] = self.counters.get("avoided_pushes", 0) + result.avoided_pushes
+
+    def record_load(self, task_map):
+        for phase, seconds in task_map.load_times.items():
+            self.add_time("load_" + phase, seconds)
+        if task_map.eager:
+            counts = task_map.interval_counts
+            self.counters["cells_computed"] += int((counts > 0).sum())
+            self.counters["intervals_computed"] += int(counts.sum())
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Flat dictionary of all measurements: time_<phase> and calls_<phase> for the timers,
+        the counters, intervals_per_cell, and peak_open and peak_closed.
+        """
+        summary = {}
+        for name, (seconds, calls) in self.timers.items():
+            summary[f"time_{name}"] = seconds
+            summary[f"calls_{name}"] = calls
+        summary.update(self.counters)
+        if self.counters["cells_computed"]:
+            summary["intervals_per_cell"] = self.counters["intervals_computed"] / self.counters["cells_computed"]
+        summary.update({f"peak_{name}": size for name, size in self.peaks.items()})
+        return summary
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=4)
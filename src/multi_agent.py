@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Prioritized multi-agent planning.
+
+Agents are planned one after another with SIPP in the order of the task. The path
+of every planned agent is reserved in the Map as a new dynamic obstacle that stays
+at the goal forever, so the safe intervals are updated incrementally, only in the
+cells the path passes through. Later agents have to reach their goals in the last
+safe interval, so they can stay there as well.
+
+A multi-agent task is a task whose <map> tag contains an <agents> tag:
+
+    <agents>
+        <agent startx="28" starty="20" finishx="8" finishy="14"/>
+        ...
+    </agents>
+
+Usage:
+    python3 src/multi_agent.py task.xml [-o log_file.xml] [-a sipp|wsipp|focal] [-w weight]
+        [-heuristic manhattan|true] [-eager] [-compact]
+"""
+
+from typing import List, Optional
+import os
+import sys
+import time
+
+import numpy as np
+
+from sipp_map import Map, INF
+from search_tree import SearchTreePQD, SearchTreeFocal, SearchTreeArrays
+from utils import ObstacleUpdate
+from trajectory import write_xml_paths_log
+import planner
+
+
+class MultiAgentResult:
+    """
+    Results of prioritized planning.
+
+    Attributes
+    ----------
+    results : list[SearchResult]
+        Search results of the agents in the order of planning.
+    search_time : float
+        Wall time of planning and reserving all agents, in seconds.
+    reserve_time : float
+        Part of search_time spent on reserving the paths in the map.
+    """
+
+    def __init__(self, results: List[planner.SearchResult], search_time: float, reserve_time: float = 0.0):
+        self.results = results
+        self.search_time = search_time
+        self.reserve_time = reserve_time
+
+    @property
+    def planned(self) -> int:
+        return sum(result.found for result in self.results)
+
+    @property
+    def sum_of_costs(self):
+        return sum(result.cost for result in self.results)
+
+    @property
+    def makespan(self):
+        return max((result.cost for result in self.results), default=0)
+
+
+def get_agents(task_map: Map) -> np.ndarray:
+    """
+    Returns the zero-based (startx, starty, finishx, finishy) of the agents of the task,
+    or of its single agent if the task has no <agents> tag.
+    """
+    if len(task_map.task.agents):
+        return task_map.task.agents
+    return np.array([[task_map.start_i, task_map.start_j, task_map.goal_i, task_map.goal_j]], dtype=np.int64)
+
+
+def reserve_path(task_map: Map, result: planner.SearchResult) -> ObstacleUpdate:
+    """
+    Adds the found path to the map as a dynamic obstacle that stays at the goal forever.
+    Obstacle trajectories have integer times in units of the move cost, so raises
+    ValueError if an arrival time of the path is not a multiple of the cost.
+    """
+    times = [node.g / task_map.cost for node in result.path]
+    if any(t != int(t) for t in times):
+        raise ValueError("ERROR: the path cannot be reserved, its arrival times are not multiples of the move cost")
+    points = [(node.j, node.i, int(t)) for node, t in zip(result.path, times)]
+    last_j, last_i, _ = points[-1]
+    points.append((last_j, last_i, int(INF // task_map.cost)))
+    return task_map.add_obstacle(points)
+
+
+def plan_agents(task_map: Map, agents: Optional[np.ndarray] = None, weight: float = 1.0, algorithm: str = "sipp",
+                compact: bool = False, heuristic: str = "manhattan") -> MultiAgentResult:
+    """
+    Plans the agents one after another, reserving the path of each planned agent
+    for the following ones. An agent without a path is skipped and reserves nothing.
+    agents holds zero-based (startx, starty, finishx, finishy) rows and defaults to
+    the agents of the task.
+    """
+    if algorithm not in planner.ALGORITHMS or algorithm == "anytime":
+        raise ValueError(f"ERROR: unknown algorithm {algorithm}")
+    agents = get_agents(task_map) if agents is None else agents
+    for start_x, start_y, goal_x, goal_y in agents.tolist():
+        planner.check_cells(task_map, (start_y, start_x), (goal_y, goal_x))
+
+    if algorithm == "focal":
+        bound, weight = weight, 1.0
+        search_tree = lambda: SearchTreeFocal(bound)
+    elif compact:
+        search_tree = lambda: SearchTreeArrays(task_map)
+    else:
+        search_tree = SearchTreePQD
+
+    start_time = time.perf_counter()
+    heuristic_func = planner.get_heuristic(task_map, heuristic)
+    results = []
+    reserve_time = 0.0
+    for start_x, start_y, goal_x, goal_y in agents.tolist():
+        task_map.set_intervals(start_y, start_x)
+        if task_map.get_interval_start(start_y, start_x, 0) > 0:
+            # An agent planned earlier passes through the start at time 0
+            results.append(planner.SearchResult(False, None, 0, 0, [], []))
+            continue
+        result = planner.sipp(task_map, start_y, start_x, goal_y, goal_x, heuristic_func, search_tree, weight,
+                              stay_at_goal=True)
+        if result.found:
+            reserve_start = time.perf_counter()
+            reserve_path(task_map, result)
+            reserve_time += time.perf_counter() - reserve_start
+        results.append(result)
+    return MultiAgentResult(results, time.perf_counter() - start_time, reserve_time)
+
+
+def write_log(task_path: str, log_path: str, result: MultiAgentResult):
+    """
+    Writes the task followed by the <log> section with the summary and one path per agent.
+    """
+    summary = {"agents": len(result.results), "planned": result.planned, "sumofcosts": str(result.sum_of_costs),
+               "makespan": str(result.makespan), "searchtime": result.search_time}
+    paths = []
+    for agent, agent_result in enumerate(result.results):
+        path = agent_result.path
+        attributes = {"agent": agent, "pathlength": len(path), "numberofsteps": agent_result.steps,
+                      "nodescreated": agent_result.nodes_created}
+        paths.append((attributes, [(node.j, node.i, node.g) for node in path]))
+    write_xml_paths_log(task_path, log_path, paths, summary)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Error: input file is not specified")
+        sys.exit()
+
+    task_path = sys.argv[1]
+    log_path = planner.get_option("-o")
+    if log_path is None:
+        log_path = os.path.join(os.path.dirname(task_path), "log_" + os.path.basename(task_path))
+
+    try:
+        weight = float(planner.get_option("-w", 1.0))
+    except ValueError:
+        print("Error: invalid weight")
+        sys.exit()
+
+    algorithm = planner.get_option("-a", "sipp")
+    if algorithm not in planner.ALGORITHMS:
+        print(f"Error: unknown algorithm {algorithm}")
+        sys.exit()
+
+    heuristic = planner.get_option("-heuristic", "manhattan")
+    if heuristic not in planner.HEURISTICS:
+        print(f"Error: unknown heuristic {heuristic}")
+        sys.exit()
+
+    try:
+        task_map = Map(task_path, eager="-eager" in sys.argv)
+        result = plan_agents(task_map, weight=weight, algorithm=algorithm, compact="-compact" in sys.argv,
+                             heuristic=heuristic)
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"Invalid input file: {e}")
+        sys.exit()
+
+    write_log(task_path, log_path, result)
+    print(f"agents={len(result.results)} planned={result.planned} sumofcosts={result.sum_of_costs} "
+          f"makespan={result.makespan} searchtime={result.search_time:.3f}s -> {log_path}")
+
+
+if __name__ == "__main__":
+    main()
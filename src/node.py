@@ -1,4 +1,7 @@
 from typing import Optional, Union
+from collections.abc import Sequence
+
+import numpy as np
 
 
 class Node:
@@ -78,4 +81,111 @@ class Node:
         """
         if self.f == other.f:
             return self.g > other.g
-        return self.f < other.f
\ No newline at end of file
+        return self.f < other.f
+
+class NodeStore:
+    """
+    Stores search nodes as rows of preallocated NumPy arrays instead of Node objects.
+    A node is identified by its row index; parent pointers are row indices too
+    (-1 for the root). Arrays grow by doubling when full. Whether g was an int is
+    kept too, so g is read back with the type a Node would have, and paths are
+    written in the same way.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.i = np.zeros(capacity, dtype=np.int32)
+        self.j = np.zeros(capacity, dtype=np.int32)
+        self.interval = np.zeros(capacity, dtype=np.int32)
+        self.g = np.zeros(capacity, dtype=np.float64)
+        self.g_is_int = np.zeros(capacity, dtype=np.bool_)
+        self.h = np.zeros(capacity, dtype=np.float64)
+        self.f = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self):
+        for name in ("i", "j", "interval", "g", "g_is_int", "h", "f", "parent"):
+            old = getattr(self, name)
+            new = np.zeros(2 * len(old), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, i: int, j: int, interval: int, g: Union[float, int], h: Union[float, int],
+            f: Union[float, int], parent: int = -1) -> int:
+        """
+        Appends a node and returns its index.
+        """
+        if self.size == len(self.i):
+            self._grow()
+        index = self.size
+        self.i[index], self.j[index], self.interval[index] = i, j, interval
+        self.g[index], self.g_is_int[index] = g, type(g) is int
+        self.h[index], self.f[index] = h, f
+        self.parent[index] = parent
+        self.size += 1
+        return index
+
+    def get_g(self, index: int) -> Union[float, int]:
+        g = float(self.g[index])
+        return int(g) if self.g_is_int[index] else g
+
+
+class NodeRef:
+    """
+    Node-like view of a row of a NodeStore, so that array-backed search trees can be used
+    by the same search loop and path reconstruction as the Node-based ones. The fields
+    read by the search loop are copied on creation; h, f and parent are read on access.
+    """
+
+    __slots__ = ("store", "index", "i", "j", "interval", "g")
+
+    def __init__(self, store: NodeStore, index: int):
+        self.store = store
+        self.index = index
+        self.i = int(store.i[index])
+        self.j = int(store.j[index])
+        self.interval = int(store.interval[index])
+        self.g = store.get_g(index)
+
+    @property
+    def h(self) -> float:
+        return float(self.store.h[self.index])
+
+    @property
+    def f(self) -> float:
+        return float(self.store.f[self.index])
+
+    @property
+    def parent(self) -> Optional["NodeRef"]:
+        parent = int(self.store.parent[self.index])
+        return NodeRef(self.store, parent) if parent >= 0 else None
+
+    def __eq__(self, other):
+        return self.i == other.i and self.j == other.j and self.interval == other.interval
+
+    def __hash__(self):
+        return hash((self.i, self.j, self.interval))
+
+    def __lt__(self, other):
+        if self.f == other.f:
+            return self.g > other.g
+        return self.f < other.f
+
+
+class NodeRefs(Sequence):
+    """
+    Sequence of NodeRef views of the given rows of a NodeStore, created on access.
+    """
+
+    def __init__(self, store: NodeStore, indices: Sequence[int]):
+        self.store = store
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, position: int) -> NodeRef:
+        return NodeRef(self.store, self.indices[position])
@@ -0,0 +1,819 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+SIPP and WSIPP planners.
+
+Usage:
+    python3 src/planner.py task.xml [-o log_file.xml | trajectory.npz] [-a sipp|wsipp|focal|anytime] [-w weight]
+        [-heuristic manhattan|true] [-eager] [-compact] [-cache cache_dir]
+        [-max-expansions N] [-max-time seconds] [-max-nodes N] [-stats stats.json] [-ref] [-collapse] [-corridor W]
+
+For focal the weight is the suboptimality bound, for anytime the initial weight.
+With -stats the search is instrumented (see instrumentation.py), and the measurements
+are written into the summary of the log and into the stats file as JSON.
+With -ref the log references the task instead of copying it, with -collapse the path
+is written with waits and straight moves collapsed into segments. An output file
+ending with .npz gets a binary trajectory instead of the log (see trajectory.py).
+With -corridor the search is restricted to cells within W of a static shortest path
+and the corridor is widened until a path is found (see corridor_plan).
+"""
+
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Type, Union
+from heapq import heapify, heappop, heappush
+import os
+import sys
+import time
+
+from node import Node
+from sipp_map import Map, INF
+from search_tree import SearchTreePQD, SearchTreeFocal, SearchTreeArrays
+from heuristics import TrueDistanceHeuristic
+from corridor import Corridor
+from utils import ObstacleUpdate
+from instrumentation import Instrumentation
+from trajectory import collapse_path, result_points, save_trajectory, write_xml_log
+
+
+class SearchResult:
+    """
+    Result of a single search.
+
+    Attributes
+    ----------
+    found : bool
+        Whether a path was found.
+    goal_node : Node | None
+        The last node of the found path.
+    steps : int
+        Number of iterations of the main loop.
+    tree_size : int
+        Size of the search tree at the final iteration.
+    opened : Iterable[Node] | None
+        Nodes left in OPEN.
+    expanded : Iterable[Node]
+        Nodes in CLOSED.
+    search_time : float
+        Wall time of the search, in seconds.
+    stale_pops : int
+        Nodes popped from OPEN and skipped because their state was already expanded.
+    avoided_pushes : int
+        Nodes not pushed to OPEN because it had a copy of the state with the same or a better g.
+    budget_exhausted : bool
+        Whether the search was stopped by its budget before finding a path or exhausting OPEN.
+    invalidated_cells : set[tuple[int, int]]
+        Cells whose safe intervals changed after the search, so the nodes in them are stale (see replan).
+    """
+
+    def __init__(
+        self,
+        found: bool,
+        goal_node: Optional[Node],
+        steps: int,
+        tree_size: int,
+        opened: Optional[Iterable[Node]],
+        expanded: Iterable[Node],
+        search_time: float = 0.0,
+        stale_pops: int = 0,
+        avoided_pushes: int = 0,
+        budget_exhausted: bool = False,
+        invalidated_cells: Optional[set] = None,
+    ):
+        self.found = found
+        self.goal_node = goal_node
+        self.steps = steps
+        self.tree_size = tree_size
+        self.opened = opened
+        self.expanded = expanded
+        self.search_time = search_time
+        self.stale_pops = stale_pops
+        self.avoided_pushes = avoided_pushes
+        self.budget_exhausted = budget_exhausted
+        self.invalidated_cells = invalidated_cells if invalidated_cells is not None else set()
+
+    @property
+    def status(self) -> str:
+        """
+        "ok" if a path was found, "budget_exhausted" if the search was stopped by its budget, "no_path" otherwise.
+        """
+        if self.found:
+            return "ok"
+        return "budget_exhausted" if self.budget_exhausted else "no_path"
+
+    @property
+    def nodes_created(self) -> int:
+        return len(self.opened) if self.opened is not None else 0
+
+    @property
+    def path(self) -> List[Node]:
+        """
+        The found path with wait actions unrolled into unit steps, empty if no path was found.
+        """
+        if not self.found:
+            return []
+        return fill_waits(make_path(self.goal_node))
+
+    @property
+    def cost(self) -> Union[float, int]:
+        return self.goal_node.g if self.found else 0
+
+
+class AnytimeResult(SearchResult):
+    """
+    Solution reported by anytime_sipp.
+
+    Attributes
+    ----------
+    weight : float
+        Weight of the iteration that found the solution.
+    bound : float
+        Proven suboptimality bound of the solution, 1.0 once it is known to be optimal.
+    """
+
+    def __init__(self, *args, weight: float = 1.0, bound: float = 1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.weight = weight
+        self.bound = bound
+
+
+class CorridorResult(SearchResult):
+    """
+    Result of corridor_plan: the last search, with steps, search_time and the
+    duplicate counters summed over all the searches.
+
+    Attributes
+    ----------
+    width : int
+        Width of the corridor of the last search.
+    corridor_cells : int
+        Number of cells of the corridor of the last search.
+    attempts : list[tuple[int, int, int]]
+        Width, number of corridor cells and steps of every search.
+    """
+
+    def __init__(self, *args, width: int = 0, corridor_cells: int = 0, attempts=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.width = width
+        self.corridor_cells = corridor_cells
+        self.attempts = list(attempts)
+
+
+class Budget:
+    """
+    Limits of a search. The search stops with the "budget_exhausted" status once
+    it has made max_expansions iterations, run for max_time seconds or grown its
+    search tree to max_nodes nodes. Limits that are None are not checked.
+    """
+
+    def __init__(self, max_expansions: Optional[int] = None, max_time: Optional[float] = None,
+                 max_nodes: Optional[int] = None):
+        self.max_expansions = max_expansions
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+
+    def exhausted(self, expansions: int, nodes: int, elapsed: float) -> bool:
+        return (self.max_expansions is not None and expansions >= self.max_expansions) or \
+               (self.max_nodes is not None and nodes >= self.max_nodes) or \
+               (self.max_time is not None and elapsed >= self.max_time)
+
+
+class _RemainingBudget(Budget):
+    """
+    What is left of a budget after the expansions and seconds already spent by earlier searches.
+    The node limit applies to every search on its own.
+    """
+
+    def __init__(self, budget: Budget, expansions: int, elapsed: float):
+        super().__init__()
+        self.budget = budget
+        self.spent_expansions = expansions
+        self.spent_time = elapsed
+
+    def exhausted(self, expansions: int, nodes: int, elapsed: float) -> bool:
+        return self.budget.exhausted(self.spent_expansions + expansions, nodes, self.spent_time + elapsed)
+
+
+def sipp(
+    task_map: Map,
+    start_i: int,
+    start_j: int,
+    goal_i: int,
+    goal_j: int,
+    heuristic_func: Callable,
+    search_tree: Type[SearchTreePQD] = SearchTreePQD,
+    weight: float = 1.0,
+    stay_at_goal: bool = False,
+    budget: Optional[Budget] = None,
+    seed: Optional[Tuple[List[Node], List[Node], List[Node]]] = None,
+) -> SearchResult:
+    """
+    Implements the SIPP search algorithm (WSIPP if weight > 1).
+
+    Parameters
+    ----------
+    task_map : Map
+        The grid or map being searched.
+    start_i, start_j : int, int
+        Starting coordinates.
+    goal_i, goal_j : int, int
+        Goal coordinates.
+    heuristic_func : Callable
+        Heuristic function for estimating the distance from a node to the goal.
+    search_tree : Type[SearchTreePQD]
+        The search tree class (or a factory without arguments) to use.
+    weight : float
+        Weight of the heuristic, f = g + weight * h.
+    stay_at_goal : bool
+        Whether the goal must be reached in its last safe interval, so the agent can stay there forever.
+    budget : Budget | None
+        Limits of the search.
+    seed : tuple[list[Node], list[Node], list[Node]] | None
+        Nodes of a previous search to continue from instead of the start: CLOSED nodes,
+        parents first, OPEN nodes, and the CLOSED nodes whose successors must be generated
+        again (see replan). Their parents must be among the given CLOSED nodes.
+
+    Returns
+    -------
+    SearchResult
+        Found path, search statistics and the measured search time.
+    """
+    start_time = time.perf_counter()
+    ast = search_tree()
+    steps = 0
+
+    def expand(current):
+        for i, j, cost1, cost2, interval in task_map.get_successors(current):
+            new = Node(i, j, interval, g=max(current.g + cost1, cost2))
+            if not ast.was_expanded(new):
+
+                new.parent = current
+
+                new.h = heuristic_func(i, j, goal_i, goal_j)
+                new.f = new.g + weight * new.h
+
+                ast.add_to_open(new)
+
+    task_map.set_intervals(start_i, start_j)
+    if seed is None:
+        h = heuristic_func(start_i, start_j, goal_i, goal_j)
+        start_node = Node(start_i, start_j, interval=0, g=0, h=h, f=weight * h)
+        ast.add_to_open(start_node)
+    else:
+        closed, opened, frontier = seed
+        tree_nodes = {}  # id of a seed node -> its node in the search tree
+        for node in closed:
+            if node.parent is not None:
+                node.parent = tree_nodes[id(node.parent)]
+            ast.add_to_open(node)
+            tree_nodes[id(node)] = ast.get_best_node_from_open()
+            ast.add_to_closed(tree_nodes[id(node)])
+        for node in opened:
+            node.parent = tree_nodes[id(node.parent)]
+            ast.add_to_open(node)
+        for node in frontier:
+            expand(tree_nodes[id(node)])
+
+    while not ast.open_is_empty():
+        if budget is not None and budget.exhausted(steps, len(ast), time.perf_counter() - start_time):
+            return SearchResult(False, None, steps, len(ast), ast.opened, ast.expanded,
+                                time.perf_counter() - start_time, *_counters(ast), budget_exhausted=True)
+
+        current = ast.get_best_node_from_open()
+
+        steps += 1
+
+        if current is None:
+            break
+
+        if current.i == goal_i and current.j == goal_j and \
+                (not stay_at_goal or task_map.get_interval_end(goal_i, goal_j, current.interval) >= INF):  # is goal
+            return SearchResult(True, current, steps, len(ast), ast.opened, ast.expanded,
+                                time.perf_counter() - start_time, *_counters(ast))
+
+        ast.add_to_closed(current)
+
+        expand(current)
+
+    return SearchResult(False, None, steps, len(ast), ast.opened, ast.expanded, time.perf_counter() - start_time,
+                        *_counters(ast))
+
+
+def _counters(ast) -> Tuple[int, int]:
+    """
+    Returns the stale pops and avoided pushes of the search tree, if it counts them.
+    """
+    return ast.number_of_open_dublicates, getattr(ast, "number_of_avoided_pushes", 0)
+
+
+def wsipp(
+    task_map: Map,
+    start_i: int,
+    start_j: int,
+    goal_i: int,
+    goal_j: int,
+    heuristic_func: Callable,
+    weight: float,
+    search_tree: Type[SearchTreePQD] = SearchTreePQD,
+    budget: Optional[Budget] = None,
+) -> SearchResult:
+    """
+    Weighted SIPP: SIPP with the heuristic inflated by weight.
+    """
+    return sipp(task_map, start_i, start_j, goal_i, goal_j, heuristic_func, search_tree, weight, budget=budget)
+
+
+def focal_sipp(
+    task_map: Map,
+    start_i: int,
+    start_j: int,
+    goal_i: int,
+    goal_j: int,
+    heuristic_func: Callable,
+    bound: float,
+    budget: Optional[Budget] = None,
+) -> SearchResult:
+    """
+    Focal SIPP: expands the node with the minimum h among the nodes of OPEN with
+    f <= bound * f_min, so the cost of the found path is at most bound times the optimal one.
+    """
+    return sipp(task_map, start_i, start_j, goal_i, goal_j, heuristic_func, lambda: SearchTreeFocal(bound),
+                budget=budget)
+
+
+def anytime_sipp(
+    task_map: Map,
+    start_i: int,
+    start_j: int,
+    goal_i: int,
+    goal_j: int,
+    heuristic_func: Callable,
+    weight: float,
+    weight_step: float = 0.5,
+    budget: Optional[Budget] = None,
+) -> Iterator[AnytimeResult]:
+    """
+    Anytime SIPP in the manner of ARA*: runs WSIPP with the given weight and then
+    repeatedly with the weight decreased by weight_step down to 1, yielding every
+    improved solution as soon as it is found. The weight is never kept above the
+    proven suboptimality bound of the current solution, and the last solution is
+    yielded again, with bound 1.0, once it is proven optimal.
+
+    Iterations reuse the search effort: g-values and parents of all states are kept,
+    and each iteration starts from the OPEN of the previous one together with the
+    states whose g-value improved after they were expanded, re-keyed with the new weight.
+
+    The budget covers the whole run. When it is exhausted the generator yields the
+    best solution found, unless it was already yielded, and stops, so the last
+    yielded solution is always the best one found. If no path is found a single
+    unsuccessful result is yielded.
+    """
+    start_time = time.perf_counter()
+    steps = 0
+    counter = 0
+
+    h = heuristic_func(start_i, start_j, goal_i, goal_j)
+    start_node = Node(start_i, start_j, interval=0, g=0, h=h, f=weight * h)
+    task_map.set_intervals(start_i, start_j)
+    nodes = {start_node: start_node}  # Current node of every generated state
+    opened = [(start_node.f, -start_node.g, counter, start_node)]
+    closed = set()
+    inconsistent = []  # Expanded states whose g-value improved during the iteration
+    incumbent = start_node if (start_i, start_j) == (goal_i, goal_j) else None
+    reported = None
+    stopped = False
+
+    while True:
+        while opened and (incumbent is None or incumbent.g > opened[0][0]):
+            if budget is not None and budget.exhausted(steps, len(nodes), time.perf_counter() - start_time):
+                stopped = True
+                break
+            current = heappop(opened)[3]
+            if nodes[current] is not current:
+                continue
+            steps += 1
+            closed.add(current)
+
+            for i, j, cost1, cost2, interval in task_map.get_successors(current):
+                g = max(current.g + cost1, cost2)
+                new = Node(i, j, interval, g=g, parent=current)
+                known = nodes.get(new)
+                if known is not None and known.g <= g:
+                    continue
+                new.h = heuristic_func(i, j, goal_i, goal_j) if known is None else known.h
+                new.f = g + weight * new.h
+                nodes[new] = new
+                if i == goal_i and j == goal_j and (incumbent is None or g < incumbent.g):
+                    incumbent = new
+                if new in closed:
+                    inconsistent.append(new)
+                else:
+                    counter += 1
+                    heappush(opened, (new.f, -g, counter, new))
+
+        if stopped and incumbent is None:
+            yield AnytimeResult(False, None, steps, len(nodes), [entry[3] for entry in opened], closed,
+                                time.perf_counter() - start_time, budget_exhausted=True, weight=weight)
+            return
+        if incumbent is None:
+            yield AnytimeResult(False, None, steps, len(nodes), [], closed, time.perf_counter() - start_time,
+                                weight=weight)
+            return
+
+        frontier = [entry[3] for entry in opened if nodes[entry[3]] is entry[3]] + \
+                   [node for node in inconsistent if nodes[node] is node]
+        lower_bound = min((node.g + node.h for node in frontier), default=incumbent.g)
+        bound = max(1.0, min(weight, incumbent.g / lower_bound) if lower_bound > 0 else 1.0)
+        final = not stopped and (weight <= 1.0 or bound <= 1.0)
+        if incumbent is not reported or final:
+            # A solution found just before the budget ran out is still reported, with its current bound
+            yield AnytimeResult(True, incumbent, steps, len(nodes), frontier, closed,
+                                time.perf_counter() - start_time, budget_exhausted=stopped, weight=weight,
+                                bound=1.0 if final else bound)
+            reported = incumbent
+        if final or stopped:
+            return
+
+        weight = max(1.0, min(weight - weight_step, bound))
+        opened = []
+        for node in frontier:
+            node.f = node.g + weight * node.h
+            counter += 1
+            opened.append((node.f, -node.g, counter, node))
+        heapify(opened)
+        closed = set()
+        inconsistent = []
+
+
+ALGORITHMS = ("sipp", "wsipp", "focal", "anytime")
+
+
+HEURISTICS = ("manhattan", "true")
+
+
+def get_heuristic(task_map: Map, heuristic: str = "manhattan") -> Callable:
+    """
+    Returns the heuristic function: the Manhattan distance or the static
+    shortest path distance to the goal (see heuristics.TrueDistanceHeuristic).
+    """
+    if heuristic not in HEURISTICS:
+        raise ValueError(f"ERROR: unknown heuristic {heuristic}")
+    if heuristic == "true":
+        return TrueDistanceHeuristic(task_map)
+    return task_map.get_distance
+
+
+def check_cells(task_map: Map, *cells: Tuple[int, int]):
+    """
+    Raises ValueError if one of the (row, column) cells is outside the grid or blocked.
+    """
+    for i, j in cells:
+        if not (0 <= i < task_map.get_height() and 0 <= j < task_map.get_width()) or not task_map.is_traversable(i, j):
+            raise ValueError("ERROR: start or goal cell is outside the grid or blocked")
+
+
+def plan(task_map: Map, weight: float = 1.0, algorithm: str = "sipp", compact: bool = False,
+         heuristic: str = "manhattan", start: Optional[Tuple[int, int]] = None,
+         goal: Optional[Tuple[int, int]] = None, budget: Optional[Budget] = None,
+         on_solution: Optional[Callable[[AnytimeResult], None]] = None,
+         instrumentation: Optional[Instrumentation] = None,
+         seed: Optional[Tuple[List[Node], List[Node], List[Node]]] = None) -> SearchResult:
+    """
+    Runs the search between the start and the goal of the task, or between the
+    given start and goal cells, as (row, column) pairs.
+    weight is the heuristic weight for sipp/wsipp, the suboptimality bound for focal
+    and the initial weight for anytime, which returns its last solution and passes
+    every solution to on_solution as soon as it is found.
+    compact switches sipp/wsipp to the array-backed SearchTreeArrays.
+    If instrumentation is given, the map, the search tree and the heuristic are
+    instrumented for the duration of the search. seed continues sipp/wsipp from the
+    nodes of a previous search (see sipp and replan).
+    Map keeps x in the i coordinate, while the search runs on (row, column).
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"ERROR: unknown algorithm {algorithm}")
+
+    check_cells(task_map, *(cell for cell in (start, goal) if cell is not None))
+    start_i, start_j = start if start is not None else (task_map.start_j, task_map.start_i)
+    goal_i, goal_j = goal if goal is not None else (task_map.goal_j, task_map.goal_i)
+    heuristic_func = get_heuristic(task_map, heuristic)
+
+    if algorithm == "focal":
+        bound, weight = weight, 1.0
+        search_tree = lambda: SearchTreeFocal(bound)
+    else:
+        search_tree = (lambda: SearchTreeArrays(task_map)) if compact else SearchTreePQD
+    if instrumentation is not None:
+        instrumentation.attach_map(task_map)
+        heuristic_func = instrumentation.timed("heuristic", heuristic_func)
+        search_tree = instrumentation.tree_factory(search_tree)
+
+    try:
+        if algorithm == "anytime":
+            result = None
+            for result in anytime_sipp(task_map, start_i, start_j, goal_i, goal_j, heuristic_func, weight,
+                                       budget=budget):
+                if on_solution is not None and result.found:
+                    on_solution(result)
+        else:
+            result = sipp(task_map, start_i, start_j, goal_i, goal_j, heuristic_func, search_tree, weight,
+                          budget=budget, seed=seed if algorithm != "focal" else None)
+    finally:
+        if instrumentation is not None:
+            instrumentation.detach_map(task_map)
+    if instrumentation is not None:
+        instrumentation.record_result(result)
+    return result
+
+
+def corridor_plan(task_map: Map, width: int, weight: float = 1.0, algorithm: str = "sipp",
+                  start: Optional[Tuple[int, int]] = None, goal: Optional[Tuple[int, int]] = None,
+                  budget: Optional[Budget] = None, **kwargs) -> CorridorResult:
+    """
+    Runs plan() restricted to the corridor of the given width around a static shortest
+    path (see corridor.py). If no path is found in the corridor, the corridor is doubled
+    and the search is repeated, until a path is found, the budget (which covers all the
+    searches together) is exhausted or the
+    corridor holds the whole static component of the start, so a path is found whenever
+    one exists. The path is optimal within its corridor, but a path that leaves the
+    corridor to avoid the obstacles may be cheaper. The other arguments are passed to plan().
+    """
+    start_time = time.perf_counter()
+    check_cells(task_map, *(cell for cell in (start, goal) if cell is not None))
+    start = start if start is not None else (task_map.start_j, task_map.start_i)
+    goal = goal if goal is not None else (task_map.goal_j, task_map.goal_i)
+    corridor = Corridor(task_map.grid, start, goal, width)
+
+    attempts = []
+    steps = stale_pops = avoided_pushes = 0
+    exhausted = False
+    while True:
+        remaining = _RemainingBudget(budget, steps, time.perf_counter() - start_time) if budget is not None else None
+        corridor.attach(task_map)
+        try:
+            result = plan(task_map, weight, algorithm, start=start, goal=goal, budget=remaining, **kwargs)
+        finally:
+            corridor.detach(task_map)
+        attempts.append((corridor.width, corridor.cells, result.steps))
+        steps += result.steps
+        stale_pops += result.stale_pops
+        avoided_pushes += result.avoided_pushes
+        exhausted = result.budget_exhausted or \
+            (budget is not None and budget.exhausted(steps, 0, time.perf_counter() - start_time))
+        if result.found or exhausted or corridor.complete:
+            break
+        corridor.widen()
+
+    return CorridorResult(result.found, result.goal_node, steps, result.tree_size, result.opened, result.expanded,
+                          time.perf_counter() - start_time, stale_pops, avoided_pushes,
+                          exhausted and not result.found, width=corridor.width, corridor_cells=corridor.cells,
+                          attempts=attempts)
+
+
+def replan(task_map: Map, previous: SearchResult, updates: Iterable[ObstacleUpdate], weight: float = 1.0,
+           algorithm: str = "sipp", compact: bool = False, heuristic: str = "manhattan",
+           start: Optional[Tuple[int, int]] = None, goal: Optional[Tuple[int, int]] = None,
+           budget: Optional[Budget] = None) -> SearchResult:
+    """
+    Updates the result of plan() after the obstacle updates of task_map, run with the same arguments.
+
+    If no update relaxed a constraint, the costs of all paths could only grow, so a previous
+    path that avoids every invalidated cell is still collision free and still within the
+    optimality (or suboptimality) bound, and a missing path is still missing. Such a result
+    is returned without searching, with zero steps, and keeps the search tree for the next
+    updates. Otherwise, for sipp and wsipp, the search continues from the nodes of the
+    previous search whose path from the start avoids every invalidated cell: their g-values
+    are still achievable and could not have improved, so they are kept as they are (see
+    _reusable_nodes). After a relaxing update, or if the start is invalidated, the search is
+    run again from scratch on the same map: safe intervals are recomputed only for the
+    invalidated cells and the true distance tables depend on the static grid only, so both
+    are reused.
+    """
+    start_time = time.perf_counter()
+    updates = list(updates)
+    if any(update.relaxed for update in updates):
+        return plan(task_map, weight, algorithm, compact, heuristic, start, goal, budget)
+
+    cells = set().union(*(update.cells for update in updates))
+    invalidated = previous.invalidated_cells | cells
+    if previous.found and all((node.i, node.j) not in cells for node in make_path(previous.goal_node)) or \
+            not previous.found and not previous.budget_exhausted:
+        return SearchResult(previous.found, previous.goal_node, 0, previous.tree_size, previous.opened,
+                            previous.expanded, time.perf_counter() - start_time, invalidated_cells=invalidated)
+    seed = None
+    if algorithm in ("sipp", "wsipp") and previous.expanded is not None:
+        seed = _reusable_nodes(previous, invalidated)
+    return plan(task_map, weight, algorithm, compact, heuristic, start, goal, budget, seed=seed)
+
+
+def _reusable_nodes(previous: SearchResult,
+                    invalidated: set) -> Optional[Tuple[List[Node], List[Node], List[Node]]]:
+    """
+    Copies the nodes of the previous search whose path from the start avoids the invalidated
+    cells into a seed for sipp, or returns None if the start cell is invalidated.
+
+    The kept CLOSED nodes are returned parents first, with the OPEN nodes whose parent is
+    kept. A state whose best node was dropped may still be reached from a kept CLOSED node,
+    whose successors were pushed with a worse g-value or not at all, so the kept CLOSED
+    nodes next to a cell with dropped nodes (or invalidated) are returned as the frontier
+    whose successors are generated again.
+    """
+    copies = {}  # (i, j, interval) of a kept CLOSED node -> its copy
+    dropped = {}  # (i, j, interval) of a dropped CLOSED node
+    closed = []
+    dropped_cells = set(invalidated)
+
+    def copy(node):
+        chain = []
+        while node is not None and (node.i, node.j, node.interval) not in copies:
+            state = (node.i, node.j, node.interval)
+            if state in dropped:
+                break
+            chain.append(node)
+            node = node.parent
+        parent = None if node is None else copies.get((node.i, node.j, node.interval))
+        valid = node is None or parent is not None
+        for node in reversed(chain):
+            state = (node.i, node.j, node.interval)
+            if valid and (node.i, node.j) not in invalidated:
+                parent = copies[state] = Node(node.i, node.j, node.interval, node.g, node.h, node.f, parent)
+                closed.append(parent)
+            else:
+                valid = False
+                dropped[state] = True
+                dropped_cells.add((node.i, node.j))
+        return parent if valid else None
+
+    for node in previous.expanded:
+        copy(node)
+    if not closed:
+        return None
+
+    opened = []
+    for node in previous.opened:
+        state = (node.i, node.j, node.interval)
+        if state in copies:
+            continue  # A stale copy of an expanded state
+        parent = node.parent
+        parent = copies.get((parent.i, parent.j, parent.interval)) if parent is not None else None
+        if parent is None or (node.i, node.j) in invalidated:
+            dropped_cells.add((node.i, node.j))
+            continue
+        opened.append(Node(node.i, node.j, node.interval, node.g, node.h, node.f, parent))
+
+    near = {(i + di, j + dj) for i, j in dropped_cells for di in (-1, 0, 1) for dj in (-1, 0, 1)}
+    frontier = [node for node in closed if (node.i, node.j) in near]
+    return closed, opened, frontier
+
+
+def make_path(goal_node: Node) -> List[Node]:
+    """
+    Unwinds the parent pointers of goal_node into the list of nodes from the start.
+    """
+    nodes = [goal_node]
+    while nodes[-1].parent is not None:
+        nodes.append(nodes[-1].parent)
+    return list(reversed(nodes))
+
+
+def fill_waits(nodes: List[Node]) -> List[Node]:
+    """
+    Inserts a node for every unit of time the agent waits in a cell before moving on.
+    """
+    points = []
+    for index, point in enumerate(nodes):
+        if index == 0:
+            points.append(point)
+            continue
+
+        if point.g - nodes[index - 1].g != 1:
+            time = nodes[index - 1].g + 1
+            while time < point.g:
+                points.append(Node(nodes[index - 1].i, nodes[index - 1].j, time, g=time))
+                time += 1
+
+        points.append(point)
+    return points
+
+
+def log_summary(result: SearchResult, stats: Optional[dict] = None) -> dict:
+    return {"pathlength": len(result.path), "numberofsteps": result.steps, "nodescreated": result.nodes_created,
+            "searchtime": result.search_time, **(stats or {})}
+
+
+def write_log(task_path: str, log_path: str, result: SearchResult, stats: Optional[dict] = None,
+              reference: bool = False, collapse: bool = False):
+    """
+    Writes the task (or, with reference, a reference to it) followed by the <log> section
+    with the summary and the path. stats are written as additional attributes of the summary.
+    With collapse waits and straight moves of the path are collapsed into segments.
+    """
+    # Without collapse the times are kept as they are, so the log matches the original format
+    points = collapse_path(result_points(result)) if collapse else [(node.j, node.i, node.g) for node in result.path]
+    write_xml_log(task_path, log_path, points, log_summary(result, stats), reference)
+
+
+def write_trajectory(task_map: Map, task_path: str, trajectory_path: str, result: SearchResult,
+                     stats: Optional[dict] = None):
+    """
+    Writes the collapsed path and the task into a binary .npz trajectory.
+    """
+    save_trajectory(trajectory_path, task_map.task, collapse_path(result_points(result)),
+                    log_summary(result, stats), task_path)
+
+
+def get_option(name: str, default=None):
+    if name not in sys.argv:
+        return default
+
+    index = sys.argv.index(name)
+    if index + 1 >= len(sys.argv):
+        return default
+
+    return sys.argv[index + 1]
+
+
+def get_budget() -> Optional[Budget]:
+    """
+    Reads the -max-expansions, -max-time and -max-nodes options. Returns None if none of them is given.
+    """
+    max_expansions, max_time, max_nodes = (get_option(name) for name in ("-max-expansions", "-max-time", "-max-nodes"))
+    if max_expansions is None and max_time is None and max_nodes is None:
+        return None
+    return Budget(int(max_expansions) if max_expansions is not None else None,
+                  float(max_time) if max_time is not None else None,
+                  int(max_nodes) if max_nodes is not None else None)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Error: input file is not specified")
+        sys.exit()
+
+    task_path = sys.argv[1]
+    log_path = get_option("-o")
+    if log_path is None:
+        log_path = os.path.join(os.path.dirname(task_path), "log_" + os.path.basename(task_path))
+
+    try:
+        weight = float(get_option("-w", 1.0))
+    except ValueError:
+        print("Error: invalid weight")
+        sys.exit()
+
+    algorithm = get_option("-a", "sipp")
+    if algorithm not in ALGORITHMS:
+        print(f"Error: unknown algorithm {algorithm}")
+        sys.exit()
+
+    heuristic = get_option("-heuristic", "manhattan")
+    if heuristic not in HEURISTICS:
+        print(f"Error: unknown heuristic {heuristic}")
+        sys.exit()
+
+    try:
+        budget = get_budget()
+    except ValueError:
+        print("Error: invalid budget")
+        sys.exit()
+
+    try:
+        width = int(get_option("-corridor")) if "-corridor" in sys.argv else None
+    except (TypeError, ValueError):
+        print("Error: invalid corridor width")
+        sys.exit()
+
+    try:
+        task_map = Map(task_path, eager="-eager" in sys.argv, cache_dir=get_option("-cache"))
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"Invalid input file: {e}")
+        sys.exit()
+
+    stats_path = get_option("-stats")
+    instrumentation = Instrumentation() if stats_path is not None else None
+    if instrumentation is not None:
+        instrumentation.record_load(task_map)
+
+    def report(solution: AnytimeResult):
+        print(f"weight={solution.weight} cost={solution.cost} bound={solution.bound:.3f} steps={solution.steps} "
+              f"time={solution.search_time:.3f}s")
+
+    options = dict(compact="-compact" in sys.argv, heuristic=heuristic, budget=budget, on_solution=report,
+                   instrumentation=instrumentation)
+    if width is not None:
+        result = corridor_plan(task_map, width, weight, algorithm, **options)
+        print("corridor: " + ", ".join(f"width={w} cells={cells} steps={steps}" for w, cells, steps in result.attempts))
+    else:
+        result = plan(task_map, weight, algorithm, **options)
+    stats = instrumentation.summary() if instrumentation is not None else None
+    if log_path.endswith(".npz"):
+        write_trajectory(task_map, task_path, log_path, result, stats)
+    else:
+        write_log(task_path, log_path, result, stats, reference="-ref" in sys.argv, collapse="-collapse" in sys.argv)
+    if stats_path is not None:
+        instrumentation.write(stats_path)
+    print(f"status={result.status} pathlength={len(result.path)} steps={result.steps} "
+          f"nodescreated={result.nodes_created} searchtime={result.search_time:.3f}s -> {log_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Portfolio solving: several configurations of the planner run on one task at the
+same time, each in its own worker process, and the first path guaranteed to be
+within the requested suboptimality bound wins. The other workers are cancelled.
+
+sipp guarantees an optimal path, wsipp and focal a path within their weight, so
+only the configurations whose weight does not exceed the bound are run for a
+query. An anytime configuration runs with any initial weight and wins with its
+first solution whose proven bound is within the requested one. A no_path answer
+of any configuration is final, since all of them are complete.
+
+The task is loaded once: its arrays, and with -eager its safe intervals, are
+copied into shared memory and every worker builds its Map on read-only views of
+them. Workers stay alive between queries, so their maps stay warm.
+
+Usage:
+    python3 src/portfolio.py task.xml [-bound 1.5] [-configs sipp,wsipp:1.5,focal:1.5,anytime:2]
+        [-heuristic manhattan|true] [-eager] [-cache cache_dir] [-max-time seconds] [-repeat N]
+        [-o log_file.xml] [-ref] [-collapse]
+"""
+
+from typing import List, Optional, Tuple
+from collections import Counter
+from multiprocessing import shared_memory
+import multiprocessing
+import queue
+import sys
+import time
+
+import numpy as np
+
+from sipp_map import Map
+from task_loader import Task
+from task_cache import CompiledTask, TASK_ARRAYS, INTERVAL_ARRAYS
+from trajectory import result_points, collapse_path, write_xml_log
+import planner
+
+DEFAULT_CONFIGS = "sipp,wsipp:1.05,wsipp:1.1,wsipp:1.5,wsipp:2.0,anytime:2.0"
+# How often a waiting query checks that its workers are alive, in seconds
+POLL_INTERVAL = 1.0
+
+
+class Config:
+    """
+    A configuration of the planner: the algorithm and its weight (the bound for focal,
+    the initial weight for anytime).
+    """
+
+    def __init__(self, algorithm: str, weight: float = 1.0):
+        if algorithm not in planner.ALGORITHMS:
+            raise ValueError(f"ERROR: unknown algorithm {algorithm}")
+        self.algorithm = algorithm
+        self.weight = weight
+
+    @property
+    def name(self) -> str:
+        return self.algorithm if self.algorithm == "sipp" else f"{self.algorithm}:{self.weight:g}"
+
+    @property
+    def guarantee(self) -> Optional[float]:
+        """
+        Suboptimality bound of every path of the configuration, None for anytime.
+        """
+        if self.algorithm == "anytime":
+            return None
+        return 1.0 if self.algorithm == "sipp" else self.weight
+
+
+def parse_configs(text: str) -> List[Config]:
+    configs = []
+    for item in text.split(","):
+        algorithm, _, weight = item.partition(":")
+        try:
+            configs.append(Config(algorithm, float(weight) if weight else 1.0))
+        except ValueError as e:
+            raise ValueError(f"ERROR: invalid configuration {item}") from e
+    return configs
+
+
+class SharedTask:
+    """
+    Arrays of a loaded task, and the safe intervals of an eager map, copied into
+    shared memory blocks. spec describes them for attach_map in other processes.
+    """
+
+    def __init__(self, task_map: Map):
+        task = task_map.task
+        arrays = {name: getattr(task, name) for name in TASK_ARRAYS}
+        if task_map.eager:
+            task_map.compact_intervals()
+            arrays.update(zip(INTERVAL_ARRAYS,
+                              (task_map.interval_offsets, task_map.interval_starts, task_map.interval_ends)))
+        self.blocks = []
+        self.spec = {
+            "width": task.width,
+            "height": task.height,
+            "start": task.start,
+            "finish": task.finish,
+            "cost": task_map.cost,
+            "eager": task_map.eager,
+            "arrays": {},
+        }
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec["arrays"][name] = (block.name, array.dtype.str, array.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(block.size for block in self.blocks)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach_map(task_path: str, spec: dict) -> Tuple[Map, list]:
+    """
+    Builds a Map on the shared arrays described by spec. The returned blocks must stay
+    referenced while the map is used.
+    """
+    blocks, arrays = [], {}
+    for name, (block_name, dtype, shape) in spec["arrays"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+
+    task = Task()
+    task.width, task.height = spec["width"], spec["height"]
+    task.start, task.finish = tuple(spec["start"]), tuple(spec["finish"])
+    for name in TASK_ARRAYS:
+        setattr(task, name, arrays[name])
+    intervals = tuple(arrays[name] for name in INTERVAL_ARRAYS) if spec["eager"] else None
+    compiled = CompiledTask(task, intervals, spec["cost"])
+    return Map(task_path, eager=spec["eager"], compiled=compiled), blocks
+
+
+class CancellableBudget(planner.Budget):
+    """
+    Budget of a query that is also exhausted once the query is cancelled, i.e. once
+    the shared cancelled value reaches the id of the query.
+    """
+
+    def __init__(self, cancelled, query_id: int, max_time: Optional[float] = None):
+        super().__init__(max_time=max_time)
+        self.cancelled = cancelled
+        self.query_id = query_id
+
+    def exhausted(self, expansions: int, nodes: int, elapsed: float) -> bool:
+        return self.cancelled.value >= self.query_id or super().exhausted(expansions, nodes, elapsed)
+
+
+class _BoundReached(Exception):
+    def __init__(self, result: planner.AnytimeResult):
+        self.result = result
+
+
+def _solve(task_map: Map, config: Config, heuristic: str, query: dict, cancelled) -> dict:
+    budget = CancellableBudget(cancelled, query["id"], query.get("max_time"))
+
+    def check_bound(solution: planner.AnytimeResult):
+        if solution.bound <= query["bound"]:
+            raise _BoundReached(solution)
+
+    answer = {"id": query["id"], "config": config.name}
+    # Any failure becomes an error answer, so the worker process survives it
+    try:
+        try:
+            result = planner.plan(task_map, config.weight, config.algorithm, heuristic=heuristic,
+                                  start=query.get("start"), goal=query.get("goal"), budget=budget,
+                                  on_solution=check_bound)
+            bound = config.guarantee if config.guarantee is not None else getattr(result, "bound", None)
+        except _BoundReached as reached:
+            result, bound = reached.result, reached.result.bound
+        if result is None:
+            raise ValueError("ERROR: the search returned no result")
+
+        status = result.status
+        if status == "budget_exhausted" and cancelled.value >= query["id"]:
+            status = "cancelled"
+        elif status == "ok" and (bound is None or bound > query["bound"]):
+            # An anytime search stopped by max_time before proving the bound
+            status = "budget_exhausted"
+        answer.update(status=status, cost=result.cost, bound=bound, steps=result.steps,
+                      nodes_created=result.nodes_created, search_time=result.search_time,
+                      path=result_points(result))
+    except Exception as e:
+        answer.update(status="error", error=f"{type(e).__name__}: {e}")
+    return answer
+
+
+def _worker(task_path: str, spec: dict, index: int, config: Config, heuristic: str, connection, answers,
+            cancelled):
+    start = time.perf_counter()
+    task_map, blocks = attach_map(task_path, spec)
+    answers.put({"id": 0, "worker": index, "load_time": time.perf_counter() - start})
+    while True:
+        query = connection.recv()
+        if query is None:
+            break
+        answer = _solve(task_map, config, heuristic, query, cancelled)
+        answer["worker"] = index
+        answers.put(answer)
+
+
+class PortfolioResult:
+    """
+    Answer of a portfolio query.
+
+    Attributes
+    ----------
+    status : str
+        Status of the winning answer ("ok" or "no_path"), or "budget_exhausted" if no
+        configuration answered within the bound.
+    winner : str | None
+        Name of the configuration that answered first.
+    cost, bound : float | None
+        Cost of the path and its guaranteed suboptimality bound.
+    path : np.ndarray
+        Zero-based (x, y, time) points of the path.
+    latency : float
+        Wall time from sending the query to the winning answer, in seconds.
+    answers : list[dict]
+        Answers received before the winner, including it.
+    """
+
+    def __init__(self, status: str, winner: Optional[str], cost: Optional[float], bound: Optional[float],
+                 path: np.ndarray, latency: float, answers: List[dict]):
+        self.status = status
+        self.winner = winner
+        self.cost = cost
+        self.bound = bound
+        self.path = path
+        self.latency = latency
+        self.answers = answers
+
+
+class Portfolio:
+    """
+    Worker processes, one per configuration, sharing one loaded task.
+    """
+
+    def __init__(self, task_path: str, configs: List[Config], heuristic: str = "manhattan", eager: bool = False,
+                 cache_dir: Optional[str] = None):
+        if not configs:
+            raise ValueError("ERROR: no configurations")
+        self.task_path = task_path
+        self.configs = configs
+        task_map = Map(task_path, eager=eager, cache_dir=cache_dir)
+        self.shared = SharedTask(task_map)
+        del task_map
+
+        self.query_id = 0
+        self.cancelled = multiprocessing.RawValue('q', 0)
+        self.answers = multiprocessing.Queue()
+        self.connections = []
+        self.workers = []
+        self.wins: Counter = Counter()
+        try:
+            for index, config in enumerate(configs):
+                parent_connection, child_connection = multiprocessing.Pipe()
+                worker = multiprocessing.Process(target=_worker, daemon=True,
+                                                 args=(task_path, self.shared.spec, index, config, heuristic,
+                                                       child_connection, self.answers, self.cancelled))
+                worker.start()
+                self.connections.append(parent_connection)
+                self.workers.append(worker)
+            self.load_times = [0.0] * len(configs)
+            for _ in configs:
+                answer = self._next_answer(range(len(configs)))
+                self.load_times[answer["worker"]] = answer["load_time"]
+        except BaseException:
+            self.close()
+            raise
+
+    def _next_answer(self, workers) -> dict:
+        while True:
+            try:
+                return self.answers.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if any(not self.workers[index].is_alive() for index in workers):
+                    raise RuntimeError("ERROR: a portfolio worker has died")
+
+    def solve(self, bound: float = 1.0, start: Optional[Tuple[int, int]] = None,
+              goal: Optional[Tuple[int, int]] = None, max_time: Optional[float] = None) -> PortfolioResult:
+        """
+        Runs the configurations that can meet the bound between the start and the goal
+        of the task, or the given (row, column) cells, and returns the first answer
+        that meets it. The other workers are cancelled and finish in the background.
+        """
+        eligible = [index for index, config in enumerate(self.configs)
+                    if config.guarantee is None or config.guarantee <= bound]
+        if not eligible:
+            raise ValueError("ERROR: no configuration guarantees the bound")
+
+        self.query_id += 1
+        query = {"id": self.query_id, "bound": bound, "start": start, "goal": goal, "max_time": max_time}
+        start_time = time.perf_counter()
+        for index in eligible:
+            self.connections[index].send(query)
+
+        answers = []
+        pending = len(eligible)
+        while pending:
+            answer = self._next_answer(eligible)
+            if answer["id"] != self.query_id:
+                # Late answer of a cancelled query
+                continue
+            pending -= 1
+            answers.append(answer)
+            if answer["status"] in ("ok", "no_path"):
+                latency = time.perf_counter() - start_time
+                self.cancelled.value = self.query_id
+                self.wins[answer["config"]] += 1
+                return PortfolioResult(answer["status"], answer["config"], answer["cost"], answer["bound"],
+                                       answer["path"], latency, answers)
+
+        errors = [answer["error"] for answer in answers if answer["status"] == "error"]
+        if len(errors) == len(answers):
+            raise RuntimeError(errors[0])
+        return PortfolioResult("budget_exhausted", None, None, None, np.zeros((0, 3)),
+                               time.perf_counter() - start_time, answers)
+
+    def close(self):
+        self.cancelled.value = self.query_id
+        for connection, worker in zip(self.connections, self.workers):
+            if worker.is_alive():
+                connection.send(None)
+        for worker in self.workers:
+            worker.join(timeout=POLL_INTERVAL)
+            if worker.is_alive():
+                worker.terminate()
+        self.shared.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Error: input file is not specified")
+        sys.exit()
+
+    task_path = sys.argv[1]
+    try:
+        bound = float(planner.get_option("-bound", 1.0))
+        configs = parse_configs(planner.get_option("-configs", DEFAULT_CONFIGS))
+        repeat = int(planner.get_option("-repeat", 1))
+        max_time = planner.get_option("-max-time")
+        max_time = float(max_time) if max_time is not None else None
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit()
+
+    heuristic = planner.get_option("-heuristic", "manhattan")
+    if heuristic not in planner.HEURISTICS:
+        print(f"Error: unknown heuristic {heuristic}")
+        sys.exit()
+
+    try:
+        portfolio = Portfolio(task_path, configs, heuristic, eager="-eager" in sys.argv,
+                              cache_dir=planner.get_option("-cache"))
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"Invalid input file: {e}")
+        sys.exit()
+
+    try:
+        print(f"workers={len(configs)} shared={portfolio.shared.nbytes / 2 ** 20:.2f}MiB "
+              f"load={max(portfolio.load_times):.3f}s")
+        latencies = []
+        for _ in range(repeat):
+            try:
+                result = portfolio.solve(bound, max_time=max_time)
+            except (ValueError, RuntimeError) as e:
+                print(f"Error: {e}")
+                sys.exit()
+            latencies.append(result.latency)
+            print(f"status={result.status} winner={result.winner} cost={result.cost} bound={result.bound} "
+                  f"latency={result.latency:.3f}s")
+        if repeat > 1:
+            percentiles = np.percentile(latencies, [50, 90, 99])
+            print(f"latency p50={percentiles[0]:.3f}s p90={percentiles[1]:.3f}s p99={percentiles[2]:.3f}s "
+                  f"wins={dict(portfolio.wins)}")
+
+        log_path = planner.get_option("-o")
+        if log_path is not None:
+            summary = {"pathlength": len(result.path), "winner": result.winner, "bound": bound,
+                       "latency": result.latency}
+            points = collapse_path(result.path) if "-collapse" in sys.argv else result.path
+            write_xml_log(task_path, log_path, points, summary, reference="-ref" in sys.argv)
+            print(f"-> {log_path}")
+    finally:
+        portfolio.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+from bisect import bisect_left, bisect_right, insort
 from heapq import heappop, heappush
-from node import Node
+from node import Node, NodeRef, NodeRefs, NodeStore
+
+import numpy as np
+
 
 class SearchTreePQD:
     """
@@ -10,7 +14,9 @@ class SearchTreePQD:
     def __init__(self):
         self._open = []  # Priority queue for nodes in OPEN
         self._closed = {}  # Dictionary for nodes in CLOSED (expanded nodes)
+        self._best_g = {}  # Best g-value pushed to OPEN for each state
         self._enc_open_duplicates = 0  # Number of duplicates encountered in OPEN
+        self._avoided_pushes = 0  # Number of nodes not pushed because OPEN had a copy with the same or a better g
 
     def __len__(self) -> int:
         """
@@ -30,9 +36,14 @@ class SearchTreePQD:
         """
         Adds a node to the search tree, specifically to OPEN. This node is either
         entirely new or a duplicate of an existing node in OPEN.
-        This implementation detects duplicates lazily; thus, nodes are added to
-        OPEN without initial duplicate checks.
+        A duplicate is pushed only if its g-value is better than the best one pushed
+        for the state so far; the worse copies left in OPEN are skipped lazily when popped.
         """
+        best_g = self._best_g.get(item)
+        if best_g is not None and best_g <= item.g:
+            self._avoided_pushes += 1
+            return
+        self._best_g[item] = item.g
         heappush(self._open, item)
 
     def get_best_node_from_open(self) -> Optional[Node]:
@@ -65,6 +76,14 @@ class SearchTreePQD:
         """
         return item in self._closed.keys()
 
+    @property
+    def open_size(self) -> int:
+        return len(self._open)
+
+    @property
+    def closed_size(self) -> int:
+        return len(self._closed)
+
     @property
     def opened(self):
         return self._open
@@ -75,4 +94,308 @@ class SearchTreePQD:
 
     @property
     def number_of_open_dublicates(self):
-        return self._enc_open_duplicates
\ No newline at end of file
+        return self._enc_open_duplicates
+
+    @property
+    def number_of_stale_pops(self):
+        """
+        Number of nodes popped from OPEN and thrown away because their state was already expanded.
+        """
+        return self._enc_open_duplicates
+
+    @property
+    def number_of_avoided_pushes(self):
+        return self._avoided_pushes
+
+
+class SearchTreeFocal:
+    """
+    SearchTree for focal search: OPEN is ordered by f and FOCAL holds the nodes of OPEN
+    with f <= bound * f_min, ordered by h.
+
+    OPEN is kept as buckets of nodes with equal f plus the sorted list of their keys, so when
+    f_min grows only the buckets whose f falls into the newly admitted range are moved to FOCAL
+    instead of rescanning OPEN. With a consistent heuristic f_min never decreases, so every node
+    enters FOCAL at most once.
+
+    Nodes of FOCAL are not expanded in the order of g, so a state may be reached with a smaller g
+    after it was expanded. Such nodes are re-expanded, which keeps the cost of the found path
+    within the bound.
+    """
+
+    def __init__(self, bound: float = 1.0):
+        self.bound = bound
+        self._keys = []  # Sorted f-values of the non-empty buckets of OPEN
+        self._buckets = {}  # f-value -> nodes in OPEN with this f-value
+        self._bucket_sizes = {}  # f-value -> number of nodes of the bucket that are still in OPEN
+        self._removed = set()  # ids of bucket nodes that left OPEN through FOCAL
+        self._focal = []  # Priority queue for nodes in FOCAL
+        self._threshold = None  # Maximum f-value admitted to FOCAL
+        self._open_size = 0
+        self._counter = 0
+        self._closed = {}  # Dictionary for nodes in CLOSED (expanded nodes)
+        self._enc_open_duplicates = 0  # Number of duplicates encountered in OPEN
+
+    def __len__(self) -> int:
+        """
+        Returns the size of the search tree. Useful for assessing the memory
+        footprint of the algorithm, especially at the final iteration.
+        """
+        return self._open_size + len(self._closed)
+
+    def open_is_empty(self) -> bool:
+        """
+        Checks if OPEN is empty.
+        If true, the main search loop should be interrupted.
+        """
+        return self._open_size == 0
+
+    @property
+    def f_min(self):
+        return self._keys[0] if self._keys else None
+
+    def _push_focal(self, item: Node):
+        self._counter += 1
+        heappush(self._focal, (item.h, item.f, self._counter, item))
+
+    def _raise_threshold(self):
+        """
+        Admits to FOCAL the buckets with f-values in (old threshold, bound * f_min].
+        """
+        threshold = self.bound * self._keys[0]
+        if self._threshold is not None and threshold <= self._threshold:
+            return
+        begin = 0 if self._threshold is None else bisect_right(self._keys, self._threshold)
+        end = bisect_right(self._keys, threshold)
+        for key in self._keys[begin:end]:
+            for item in self._buckets[key]:
+                if id(item) not in self._removed:
+                    self._push_focal(item)
+        self._threshold = threshold
+
+    def add_to_open(self, item: Node):
+        """
+        Adds a node to OPEN and, if its f-value is within the bound, to FOCAL.
+        Duplicates are detected lazily, as in SearchTreePQD.
+        """
+        if item.f not in self._buckets:
+            insort(self._keys, item.f)
+            self._buckets[item.f] = []
+            self._bucket_sizes[item.f] = 0
+        self._buckets[item.f].append(item)
+        self._bucket_sizes[item.f] += 1
+        self._open_size += 1
+
+        if self._threshold is not None and item.f <= self._threshold:
+            self._push_focal(item)
+        if item.f == self._keys[0]:
+            self._raise_threshold()
+
+    def _remove_from_open(self, item: Node):
+        self._open_size -= 1
+        self._bucket_sizes[item.f] -= 1
+        if self._bucket_sizes[item.f] == 0:
+            for bucket_item in self._buckets.pop(item.f):
+                self._removed.discard(id(bucket_item))
+            del self._bucket_sizes[item.f]
+            self._keys.pop(bisect_left(self._keys, item.f))
+            if self._keys:
+                self._raise_threshold()
+        else:
+            self._removed.add(id(item))
+
+    def get_best_node_from_open(self) -> Optional[Node]:
+        """
+        Retrieves the node of FOCAL with the minimum h. Nodes that were expanded
+        previously are skipped, as in SearchTreePQD.
+
+        Returns None if OPEN is empty.
+        """
+        while self._focal:
+            item = heappop(self._focal)[-1]
+            self._remove_from_open(item)
+            if not self.was_expanded(item):
+                return item
+            else:
+                self._enc_open_duplicates += 1
+        return None
+
+    def add_to_closed(self, item: Node):
+        """
+        Adds a node to the CLOSED dictionary.
+        """
+        self._closed[item] = item
+
+    def was_expanded(self, item: Node) -> bool:
+        """
+        Checks if a node has been previously expanded with the same or a smaller g-value.
+        """
+        closed = self._closed.get(item)
+        return closed is not None and closed.g <= item.g
+
+    @property
+    def open_size(self) -> int:
+        return self._open_size
+
+    @property
+    def closed_size(self) -> int:
+        return len(self._closed)
+
+    @property
+    def opened(self):
+        return [item for bucket in self._buckets.values() for item in bucket if id(item) not in self._removed]
+
+    @property
+    def expanded(self):
+        return self._closed.keys()
+
+    @property
+    def number_of_open_dublicates(self):
+        return self._enc_open_duplicates
+
+
+class SearchTreeArrays:
+    """
+    SearchTree keeping nodes in a NodeStore, OPEN as a heap of (f, -g, index) tuples
+    and CLOSED as a dense array indexed by (cell, interval id).
+
+    Nodes passed to add_to_open are copied into the store and dropped, nodes returned
+    by get_best_node_from_open are NodeRef views, so no Node objects and parent chains
+    are kept alive during the search, and the search loop is the same as for the other
+    search trees.
+
+    With an eager map, CLOSED is a boolean array over all safe intervals of the grid.
+    With a lazy map the number of intervals of a cell is not known in advance, so CLOSED
+    is a per-cell bitmask of interval ids, with a set for the rare ids above 63.
+    """
+
+    MASK_BITS = 63
+
+    def __init__(self, task_map):
+        self._map = task_map
+        self._width = task_map.get_width()
+        self._store = NodeStore()
+        self._open = []  # Priority queue of (f, -g, node index)
+        self._expanded = []  # Indices of the expanded nodes
+        if task_map.eager:
+            self._offsets = task_map.interval_offsets
+            self._closed = np.zeros(len(task_map.interval_starts), dtype=np.bool_)
+            self._best_g = np.full(len(task_map.interval_starts), np.inf)
+        else:
+            self._offsets = None
+            self._cells = task_map.get_width() * task_map.get_height()
+            self._closed_mask = [0] * self._cells
+            self._closed_overflow = set()  # interval * cells + cell of the states with interval ids above 63
+            self._best_g = {}  # interval * cells + cell -> best g pushed to OPEN
+        self._enc_open_duplicates = 0  # Number of duplicates encountered in OPEN
+        self._avoided_pushes = 0  # Number of nodes not pushed because OPEN had a copy with the same or a better g
+
+    def __len__(self) -> int:
+        """
+        Returns the size of the search tree. Useful for assessing the memory
+        footprint of the algorithm, especially at the final iteration.
+        """
+        return len(self._open) + len(self._expanded)
+
+    def open_is_empty(self) -> bool:
+        """
+        Checks if OPEN is empty.
+        If true, the main search loop should be interrupted.
+        """
+        return len(self._open) == 0
+
+    def _is_closed(self, i: int, j: int, interval: int) -> bool:
+        cell = i * self._width + j
+        if self._offsets is not None:
+            return bool(self._closed[self._offsets[cell] + interval])
+        if interval < self.MASK_BITS:
+            return bool((self._closed_mask[cell] >> interval) & 1)
+        return interval * self._cells + cell in self._closed_overflow
+
+    def add_to_open(self, item: Union[Node, NodeRef]):
+        """
+        Copies the node into the store and pushes its index to OPEN, unless OPEN
+        already had a copy of the state with the same or a better g-value.
+        """
+        i, j, interval, g = item.i, item.j, item.interval, item.g
+        cell = i * self._width + j
+        if self._offsets is not None:
+            key = self._offsets[cell] + interval
+            best_g = self._best_g[key]
+        else:
+            key = interval * self._cells + cell
+            best_g = self._best_g.get(key, np.inf)
+        if best_g <= g:
+            self._avoided_pushes += 1
+            return
+        self._best_g[key] = g
+
+        parent = item.parent.index if item.parent is not None else -1
+        index = self._store.add(i, j, interval, g, item.h, item.f, parent)
+        heappush(self._open, (item.f, -g, index))
+
+    def get_best_node_from_open(self) -> Optional[NodeRef]:
+        """
+        Retrieves the best node from OPEN, defined by the minimum f and then the maximum g.
+        Nodes whose state was expanded previously are skipped.
+
+        Returns None if OPEN is empty.
+        """
+        store = self._store
+        while self._open:
+            index = heappop(self._open)[2]
+            if not self._is_closed(int(store.i[index]), int(store.j[index]), int(store.interval[index])):
+                return NodeRef(store, index)
+            self._enc_open_duplicates += 1
+        return None
+
+    def add_to_closed(self, item: NodeRef):
+        """
+        Marks the state of the node as expanded.
+        """
+        interval = item.interval
+        cell = item.i * self._width + item.j
+        if self._offsets is not None:
+            self._closed[self._offsets[cell] + interval] = True
+        elif interval < self.MASK_BITS:
+            self._closed_mask[cell] |= 1 << interval
+        else:
+            self._closed_overflow.add(interval * self._cells + cell)
+        self._expanded.append(item.index)
+
+    def was_expanded(self, item: Union[Node, NodeRef]) -> bool:
+        """
+        Checks if a node has been previously expanded.
+        """
+        return self._is_closed(item.i, item.j, item.interval)
+
+    @property
+    def open_size(self) -> int:
+        return len(self._open)
+
+    @property
+    def closed_size(self) -> int:
+        return len(self._expanded)
+
+    @property
+    def opened(self):
+        return NodeRefs(self._store, [index for _, _, index in self._open])
+
+    @property
+    def expanded(self):
+        return NodeRefs(self._store, self._expanded)
+
+    @property
+    def number_of_open_dublicates(self):
+        return self._enc_open_duplicates
+
+    @property
+    def number_of_stale_pops(self):
+        """
+        Number of nodes popped from OPEN and thrown away because their state was already expanded.
+        """
+        return self._enc_open_duplicates
+
+    @property
+    def number_of_avoided_pushes(self):
+        return self._avoided_pushes
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Planning service: a long-running asyncio process answering start/goal queries on
+tasks it keeps loaded, so maps and their safe intervals are reused between queries.
+
+Queries and answers are JSON objects, one per line, read from stdin (answers go to
+stdout) or from clients of a local unix socket or TCP port. A query:
+
+    {"id": 1, "task": "data/den101d_200_1.xml", "start": [x, y], "goal": [x, y],
+     "algorithm": "sipp", "weight": 1.0, "heuristic": "manhattan",
+     "max_expansions": 100000, "max_time": 0.5, "max_nodes": 1000000}
+
+start and goal use the 1-based x/y of the task format and default to the ones of the
+task; the search budget limits are optional. The answer holds the status, cost, path
+points, search statistics and the query latency. {"cmd": "stats"} returns latency
+percentiles and the state of the map caches.
+
+Queries run in a pool of single-process workers. A query goes to the least loaded
+worker that already holds its task, so maps stay warm. When every such worker has
+at least replica_queue queries in flight and another worker has fewer, the task is
+loaded there as well, so many queries on one hot task run in parallel. Each worker
+evicts least recently used maps once its maps take more than its share of the
+memory budget. If a worker process dies, its queries in flight are answered with an
+error and the worker is replaced with a fresh one.
+
+Usage:
+    python3 src/service.py [-socket path | -port N] [-workers N] [-budget MiB] [-eager] [-cache cache_dir]
+        [-replica-queue N]
+"""
+
+from typing import Dict, List, Optional
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from sipp_map import Map
+import planner
+
+# Rough per-object sizes used to estimate the memory taken by a lazy map
+LIST_BYTES = 56
+INTERVAL_BYTES = 200
+INDEX_ENTRY_BYTES = 150
+
+# Queries in flight at every worker holding a task before the task gets another worker
+REPLICA_QUEUE = 1
+
+
+def estimate_map_bytes(task_map: Map) -> int:
+    """
+    Estimates the memory held by the map: its arrays plus, for a lazy map, the
+    per-cell interval lists and the segment index, whose sizes the map counts as
+    they change, so the estimate does not scan the grid.
+    """
+    size = task_map.grid.nbytes + task_map.task.obstacle_points.nbytes
+    if task_map.eager:
+        size += task_map.interval_offsets.nbytes + task_map.interval_counts.nbytes + \
+            task_map.interval_starts.nbytes + task_map.interval_ends.nbytes
+    else:
+        cells = task_map.get_width() * task_map.get_height()
+        size += cells * LIST_BYTES + task_map.lazy_intervals * INTERVAL_BYTES + \
+            task_map.index_entries * INDEX_ENTRY_BYTES
+    return size
+
+
+class MapRegistry:
+    """
+    LRU cache of loaded maps bounded by an estimated memory budget. The most recently
+    used map is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, budget_bytes: int, eager: bool = False, cache_dir: Optional[str] = None):
+        self.budget_bytes = budget_bytes
+        self.eager = eager
+        self.cache_dir = cache_dir
+        self._maps: OrderedDict = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, task_path: str) -> Map:
+        if task_path in self._maps:
+            self._maps.move_to_end(task_path)
+            return self._maps[task_path]
+        task_map = Map(task_path, eager=self.eager, cache_dir=self.cache_dir)
+        self.loads += 1
+        self._maps[task_path] = task_map
+        self.update(task_path)
+        return task_map
+
+    def update(self, task_path: str):
+        """
+        Re-estimates the size of the map (lazy maps grow as intervals are computed) and evicts
+        least recently used maps while over the budget.
+        """
+        if task_path in self._maps:
+            self._sizes[task_path] = estimate_map_bytes(self._maps[task_path])
+        while len(self._maps) > 1 and self.total_bytes > self.budget_bytes:
+            evicted, _ = self._maps.popitem(last=False)
+            del self._sizes[evicted]
+            self.evictions += 1
+
+    def drop(self, task_path: str):
+        self._maps.pop(task_path, None)
+        self._sizes.pop(task_path, None)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> dict:
+        return {"maps": list(self._maps), "bytes": self.total_bytes, "loads": self.loads, "evictions": self.evictions}
+
+
+# Registry of the worker process
+_registry: Optional[MapRegistry] = None
+
+
+def _init_worker(budget_bytes: int, eager: bool, cache_dir: Optional[str]):
+    global _registry
+    _registry = MapRegistry(budget_bytes, eager, cache_dir)
+
+
+def _cell(point: Optional[List[int]]):
+    """
+    Converts 1-based (x, y) of the task format into the (row, column) of the search.
+    """
+    return None if point is None else (int(point[1]) - 1, int(point[0]) - 1)
+
+
+def _budget(query: dict) -> Optional[planner.Budget]:
+    if not any(name in query for name in ("max_expansions", "max_time", "max_nodes")):
+        return None
+    return planner.Budget(query.get("max_expansions"), query.get("max_time"), query.get("max_nodes"))
+
+
+def solve(query: dict) -> dict:
+    """
+    Answers one query in the worker process.
+    """
+    task_path = query["task"]
+    answer = {"id": query.get("id")}
+    try:
+        task_map = _registry.get(task_path)
+        result = planner.plan(task_map, float(query.get("weight", 1.0)), query.get("algorithm", "sipp"),
+                              heuristic=query.get("heuristic", "manhattan"),
+                              start=_cell(query.get("start")), goal=_cell(query.get("goal")), budget=_budget(query))
+        answer.update(status=result.status, cost=result.cost, steps=result.steps,
+                      nodes_created=result.nodes_created, search_time=result.search_time,
+                      path=[[node.j + 1, node.i + 1, node.g] for node in result.path])
+        _registry.update(task_path)
+    except ValueError as e:
+        # Invalid task or query, the loaded map (if any) stays usable
+        answer.update(status="error", error=str(e))
+    except Exception as e:
+        # The lazily filled intervals may have been interrupted half-way
+        _registry.drop(task_path)
+        answer.update(status="error", error=f"{type(e).__name__}: {e}")
+    answer["worker"] = {"pid": os.getpid(), **_registry.stats()}
+    return answer
+
+
+class PlanningService:
+    def __init__(self, workers: int = 1, budget_mib: float = 1024, eager: bool = False,
+                 cache_dir: Optional[str] = None, history: int = 10000, replica_queue: int = REPLICA_QUEUE):
+        self.worker_args = (int(budget_mib * 2 ** 20 / workers), eager, cache_dir)
+        self.workers = [self._new_worker() for _ in range(workers)]
+        self.replica_queue = replica_queue
+        self.pending = [0] * workers  # Queries in flight at every worker
+        self.inflight = [Counter() for _ in range(workers)]  # Tasks of the queries in flight at every worker
+        self.worker_maps = [set() for _ in range(workers)]  # Tasks loaded (or being loaded) by every worker
+        self.latencies = deque(maxlen=history)
+        self.queries = 0
+        self.errors = 0
+        self.worker_stats: Dict[int, dict] = {}
+
+    def _new_worker(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(1, initializer=_init_worker, initargs=self.worker_args)
+
+    def _restart_worker(self, worker_id: int, broken: ProcessPoolExecutor):
+        """
+        Replaces a worker whose process died (e.g. killed by the OOM killer) with a fresh one.
+        The other queries in flight at the dead worker fail with it and find it replaced already.
+        """
+        if self.workers[worker_id] is not broken:
+            return
+        broken.shutdown(wait=False)
+        self.workers[worker_id] = self._new_worker()
+        self.worker_maps[worker_id] = set()
+        self.worker_stats.pop(worker_id, None)
+
+    def _worker_id(self, task_path: str) -> int:
+        """
+        The least loaded worker holding the task, or the least loaded worker overall if
+        there is none or all the holders are busy and it is less loaded than them.
+        """
+        least_loaded = min(range(len(self.workers)), key=lambda worker_id: self.pending[worker_id])
+        holders = [worker_id for worker_id, tasks in enumerate(self.worker_maps) if task_path in tasks]
+        if holders:
+            holder = min(holders, key=lambda worker_id: self.pending[worker_id])
+            if self.pending[holder] < self.replica_queue or self.pending[least_loaded] >= self.pending[holder]:
+                return holder
+        return least_loaded
+
+    async def handle(self, line: str) -> dict:
+        start = time.perf_counter()
+        try:
+            query = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"status": "error", "error": f"invalid JSON: {e}"}
+
+        if query.get("cmd") == "stats":
+            return {"id": query.get("id"), "status": "ok", "stats": self.stats()}
+        if "task" not in query:
+            return {"id": query.get("id"), "status": "error", "error": "task is not specified"}
+
+        task_path = query["task"]
+        worker_id = self._worker_id(task_path)
+        self.pending[worker_id] += 1
+        self.inflight[worker_id][task_path] += 1
+        self.worker_maps[worker_id].add(task_path)
+        worker = self.workers[worker_id]
+        try:
+            answer = await asyncio.get_running_loop().run_in_executor(worker, solve, query)
+        except BrokenProcessPool:
+            answer = {"id": query.get("id"), "status": "error", "error": "the worker process died"}
+        finally:
+            self.pending[worker_id] -= 1
+            self.inflight[worker_id][task_path] -= 1
+            if not self.inflight[worker_id][task_path]:
+                del self.inflight[worker_id][task_path]
+        if worker is not self.workers[worker_id]:
+            answer.pop("worker", None)  # Answered by a worker replaced in the meantime
+        elif "worker" in answer:
+            self.worker_stats[worker_id] = answer.pop("worker")
+            # The worker may have evicted maps; the tasks of its queries in flight are being loaded
+            self.worker_maps[worker_id] = set(self.worker_stats[worker_id]["maps"]) | set(self.inflight[worker_id])
+        else:
+            self._restart_worker(worker_id, worker)
+        answer["latency"] = time.perf_counter() - start
+        self.queries += 1
+        self.errors += answer["status"] == "error"
+        self.latencies.append(answer["latency"])
+        return answer
+
+    def stats(self) -> dict:
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        percentiles = np.percentile(latencies, [50, 90, 99])
+        return {
+            "queries": self.queries,
+            "errors": self.errors,
+            "latency": {
+                "mean": float(latencies.mean()),
+                "p50": float(percentiles[0]),
+                "p90": float(percentiles[1]),
+                "p99": float(percentiles[2]),
+                "max": float(latencies.max()),
+            },
+            "workers": self.worker_stats,
+        }
+
+    async def serve_stream(self, reader: asyncio.StreamReader, write):
+        """
+        Answers every line of the stream concurrently, writing answers as they are ready.
+        """
+        pending = set()
+        while line := await reader.readline():
+            if not line.strip():
+                continue
+
+            async def answer(line=line):
+                write(json.dumps(await self.handle(line.decode())) + "\n")
+
+            task = asyncio.create_task(answer())
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await self.serve_stream(reader, lambda text: writer.write(text.encode()))
+        await writer.drain()
+        writer.close()
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.shutdown()
+
+
+async def serve_stdin(service: PlanningService):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    await service.serve_stream(reader, write)
+
+
+async def serve_socket(service: PlanningService, socket_path: Optional[str], port: Optional[int]):
+    if socket_path is not None:
+        server = await asyncio.start_unix_server(service.handle_client, path=socket_path)
+    else:
+        server = await asyncio.start_server(service.handle_client, host="127.0.0.1", port=port)
+    async with server:
+        await server.serve_forever()
+
+
+def get_option(name: str, default=None):
+    if name not in sys.argv:
+        return default
+    index = sys.argv.index(name)
+    if index + 1 >= len(sys.argv):
+        return default
+    return sys.argv[index + 1]
+
+
+def main():
+    service = PlanningService(workers=int(get_option("-workers", 1)), budget_mib=float(get_option("-budget", 1024)),
+                              eager="-eager" in sys.argv, cache_dir=get_option("-cache"),
+                              replica_queue=int(get_option("-replica-queue", REPLICA_QUEUE)))
+    socket_path, port = get_option("-socket"), get_option("-port")
+    try:
+        if socket_path is not None or port is not None:
+            asyncio.run(serve_socket(service, socket_path, int(port) if port is not None else None))
+        else:
+            asyncio.run(serve_stdin(service))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,65 @@
+from typing import Optional
+
 from node import Node
-from utils import Interval, Obstacle
+from utils import Interval, Obstacle, ObstacleUpdate
+from task_loader import load_task, _validate_obstacles
+from task_cache import CompiledTask, compile_task, load_compiled_task
 
-from bs4 import BeautifulSoup
 import numpy as np
 import bisect
+import math
+import time
 
 INF = 100000000
 
 class Map:
-    def __init__(self, map_path: str):
+    def __init__(self, map_path: str, eager: bool = False, cache_dir: Optional[str] = None,
+                 compiled: Optional[CompiledTask] = None):
+        """
+        Loads the task from the XML file.
+
+        Safe intervals are computed lazily by set_intervals when a cell is first
+        reached by the search. With eager=True they are precomputed for the whole
+        grid at load time and stored in CSR layout: safe intervals of the cell
+        (i, j) are interval_starts[k], interval_ends[k] for
+        interval_offsets[i * width + j] <= k < interval_offsets[i * width + j + 1].
+        Obstacle updates rewrite the intervals of the touched cells in place, or move
+        them to the spare space at the end of the arrays, so once the map has been
+        updated the intervals of the cell c are those with
+        interval_offsets[c] <= k < interval_offsets[c] + interval_counts[c], and the
+        arrays hold unused slots until compact_intervals() restores the CSR layout.
+
+        If cache_dir is given, the compiled task is memory-mapped from it instead
+        of parsing the XML, and (re)written there when it is missing or stale.
+        A compiled task can also be passed directly as compiled, e.g. one whose
+        arrays live in shared memory; its safe intervals are used if it has them.
+
+        Durations of the loading phases (parse, build, intervals, cache) are
+        stored in load_times, in seconds.
+        """
         self.cost = 1
-
-        with open(map_path, 'r') as xml_file:
-            soup = BeautifulSoup(xml_file, "lxml")
-        if soup.map is None:
-            raise ValueError("ERROR: nothing in map tag")
-        self.soup = soup.map
+        self.eager = eager
+        self.load_times = {}
+
+        start = time.perf_counter()
+        if compiled is None and cache_dir is not None:
+            compiled = load_compiled_task(map_path, cache_dir)
+        self.task = compiled.task if compiled is not None else load_task(map_path)
+        self.load_times["parse"] = time.perf_counter() - start
         self.map = None
+        self.grid = None
         self.dynamic_obstacles = []
+        self.segment_index = {}
+        self.index_entries = 0  # Total length of the lists of segment_index
+        self.lazy_intervals = 0  # Total length of the interval lists of map
+        self.interval_offsets = None
+        self.interval_starts = None
+        self.interval_ends = None
+        self.interval_counts = None
+        self.interval_size = 0  # Used length of interval_starts and interval_ends
+        self.interval_capacities = {}  # Slots of the updated cells, if more than their intervals
+        self.intervals_total = 0  # Number of safe intervals, the used length minus the unused slots
+        self.owns_intervals = False  # Whether the interval arrays may be written in place
         self.width = 0
         self.height = 0
         self.start_i, self.start_j = 0, 0
@@ -27,47 +69,158 @@ class Map:
         self.cut_corners = True
         self.allow_squeeze = True
 
+        start = time.perf_counter()
         self.__get_map()
+        self.load_times["build"] = time.perf_counter() - start
+        start = time.perf_counter()
+        if self.eager:
+            if compiled is not None and compiled.intervals is not None and compiled.cost == self.cost:
+                self.interval_offsets, self.interval_starts, self.interval_ends = compiled.intervals
+            else:
+                self.__precompute_intervals()
+                self.owns_intervals = True
+            self.interval_counts = np.diff(self.interval_offsets).astype(np.int32)
+            self.interval_size = self.intervals_total = int(self.interval_offsets[-1])
+        self.load_times["intervals"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if cache_dir is not None and (compiled is None or (self.eager and compiled.intervals is None)):
+            intervals = (self.interval_offsets, self.interval_starts, self.interval_ends) if self.eager else None
+            compile_task(map_path, cache_dir, self.task, intervals, self.cost)
+        self.load_times["cache"] = time.perf_counter() - start
 
     def __get_map(self):
-        data_ptrs = [int(self.soup.width.text), int(self.soup.height.text), int(self.soup.startx.text),
-                     int(self.soup.starty.text), int(self.soup.finishx.text), int(self.soup.finishy.text)]
-        
-
-        for data_ptr in data_ptrs:
-            if data_ptr is None or data_ptr <= 0:
-                raise ValueError("ERROR: invalid value of the width, height, start of goal position")
-
-        for i in range(2, len(data_ptrs)):
-            data_ptrs[i] -= 1
-
-        self.width, self.height, self.start_i, self.start_j, self.goal_i, self.goal_j = data_ptrs
-
-        self.map = [[[] for j in range(self.width)] for i in range(self.height)]
-        if self.soup.grid is None:
-            raise ValueError("ERROR: nothing in grid tag")
-        grid = self.soup.grid
-        for i, row in enumerate(grid.find_all("row")):
-            for j, el in enumerate(row.get_text().split()):
-                el = int(el)
-                if bool(el):
-                    interval = Interval(is_safe=False, start_time=0, end_time=INF)
-                    self.map[i][j].append(interval)
-
-        dynamic_obstacles = self.soup.dynamicobstacles
-        for obstacle in dynamic_obstacles.find_all("obstacle"):
+        task = self.task
+        self.width, self.height = task.width, task.height
+        (self.start_i, self.start_j), (self.goal_i, self.goal_j) = task.start, task.finish
+
+        self.grid = task.grid
+        if not self.eager:
+            self.map = [[[] for j in range(self.width)] for i in range(self.height)]
+            for i, j in zip(*np.nonzero(self.grid)):
+                self.map[i][j].append(Interval(is_safe=False, start_time=0, end_time=INF))
+            self.lazy_intervals = int(np.count_nonzero(self.grid))
+
+        points = task.obstacle_points * np.array([1, 1, self.cost])
+        for obstacle_id in range(task.obstacles_count):
             self.dynamic_obstacles.append(Obstacle())
-            for point in obstacle.find_all("point"):
-                x, y, time = int(point["x"]), int(point["y"]), int(point["time"])
-                if self.dynamic_obstacles[-1].path:
-                    prev_point = self.dynamic_obstacles[-1].path[-1]
-                    distance = self.get_distance(x - 1, y - 1, prev_point[0], prev_point[1])
-
-                    if ((distance == 0 and (time * self.cost - prev_point[2]) <= 0) or
-                            (distance != 0 and distance != (time * self.cost - prev_point[2]))):
-                        raise ValueError("ERROR: invalid path representation")
-
-                self.dynamic_obstacles[-1].path.append((x - 1, y - 1, time * self.cost))
+            begin, end = task.obstacle_offsets[obstacle_id], task.obstacle_offsets[obstacle_id + 1]
+            self.dynamic_obstacles[-1].path = list(map(tuple, points[begin:end].tolist()))
+
+        if not self.eager:
+            for obstacle_id, obstacle in enumerate(self.dynamic_obstacles):
+                self.__index_obstacle(obstacle_id, obstacle)
+
+    def __index_obstacle(self, obstacle_id, obstacle):
+        """
+        Registers every segment of the obstacle path in segment_index, which maps a
+        cell (i, j) to the list of (obstacle id, point id) pairs whose segment
+        path[point_id - 1] -> path[point_id] passes through the cell.
+        """
+        for point_i, cells in self.__segment_cells(obstacle.path):
+            for cell in cells:
+                self.segment_index.setdefault(cell, []).append((obstacle_id, point_i))
+            self.index_entries += len(cells)
+
+    def __segment_cells(self, path):
+        """
+        Yields every point id of the path with the cells (i, j) its segment passes through.
+        """
+        for point_i in range(1, len(path)):
+            x1, y1 = path[point_i - 1][0], path[point_i - 1][1]
+            x2, y2 = path[point_i][0], path[point_i][1]
+            steps = math.gcd(x2 - x1, y2 - y1)
+            if steps == 0:
+                cells = [(y1, x1)]
+            else:
+                dx, dy = (x2 - x1) // steps, (y2 - y1) // steps
+                cells = [(y1 + k * dy, x1 + k * dx) for k in range(steps + 1)]
+                if dx != 0 and dy != 0:
+                    # Non-axis-aligned segments keep the exact semantics of point_on_segment
+                    cells = [(i, j) for i, j in cells if self.point_on_segment((j, i), [x1, y1], [x2, y2])]
+            yield point_i, cells
+
+    def __obstacle_segments(self):
+        """
+        Returns the segments of all obstacle paths as flat arrays
+        x1, y1, t1, x2, y2, t2 in the order used by segment_index.
+        """
+        segments = []
+        for obstacle in self.dynamic_obstacles:
+            path = obstacle.path
+            segments.extend(path[point_i - 1] + path[point_i] for point_i in range(1, len(path)))
+        return np.array(segments, dtype=np.float64).reshape(-1, 6).T
+
+    def __precompute_intervals(self):
+        """
+        Builds safe intervals of every free cell in a single batched pass over all
+        obstacle segments. Produces exactly the intervals set_intervals would.
+        """
+        x1, y1, t1, x2, y2, t2 = self.__obstacle_segments()
+        x1, y1, x2, y2 = (a.astype(np.int64) for a in (x1, y1, x2, y2))
+
+        # Rasterize segments: a segment with gcd(dx, dy) = n covers n + 1 lattice points
+        steps = np.gcd(x2 - x1, y2 - y1)
+        counts = steps + 1
+        segment_ids = np.repeat(np.arange(len(steps)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        safe_steps = np.maximum(steps, 1)
+        dx, dy = ((x2 - x1) // safe_steps)[segment_ids], ((y2 - y1) // safe_steps)[segment_ids]
+        cell_x, cell_y = x1[segment_ids] + k * dx, y1[segment_ids] + k * dy
+
+        distance = (np.abs(k * dx) + np.abs(k * dy)) * self.cost
+        starts = t1[segment_ids] + distance - self.cost / 2
+        ends = np.where(steps[segment_ids] == 0, t2[segment_ids], t1[segment_ids] + distance) + self.cost / 2
+
+        keep = (cell_x >= 0) & (cell_x < self.width) & (cell_y >= 0) & (cell_y < self.height)
+        diagonal = (dx != 0) & (dy != 0)
+        if diagonal.any():
+            # Same floating point check as point_on_segment
+            px, py = x1[segment_ids], y1[segment_ids]
+            qx, qy = x2[segment_ids], y2[segment_ids]
+            on_segment = (np.sqrt((px - cell_x) ** 2 + (py - cell_y) ** 2) +
+                          np.sqrt((cell_x - qx) ** 2 + (cell_y - qy) ** 2) ==
+                          np.sqrt((px - qx) ** 2 + (py - qy) ** 2))
+            keep &= ~diagonal | on_segment
+        keep[keep] = ~self.grid[cell_y[keep], cell_x[keep]]
+        cell_x, cell_y, starts, ends = cell_x[keep], cell_y[keep], starts[keep], ends[keep]
+        cells = cell_y * self.width + cell_x
+
+        # Merge overlapping collision intervals of each cell
+        order = np.lexsort((starts, cells))
+        cells, starts, ends = cells[order], starts[order], ends[order]
+        span = (ends.max() - min(starts.min(), 0) + 1) if len(ends) else 1
+        running_end = np.maximum.accumulate(ends + cells * span) - cells * span
+        new_cell = np.ones(len(cells), dtype=np.bool_)
+        new_cell[1:] = cells[1:] != cells[:-1]
+        new_group = new_cell.copy()
+        new_group[1:] |= starts[1:] > running_end[:-1]
+        last_of_group = np.roll(new_group, -1)
+        group_cells, group_starts = cells[new_group], starts[new_group]
+        group_ends = running_end[last_of_group]
+
+        # Invert merged collisions into safe intervals
+        cell_count = self.width * self.height
+        groups_per_cell = np.bincount(group_cells, minlength=cell_count)
+        first_group = np.cumsum(groups_per_cell) - groups_per_cell
+        leading = np.zeros(cell_count, dtype=np.bool_)
+        leading[group_cells[new_cell[new_group]]] = group_starts[new_cell[new_group]] > 0
+        free = ~self.grid.ravel()
+        intervals_per_cell = np.where(groups_per_cell > 0, groups_per_cell + leading, free)
+        self.interval_offsets = np.zeros(cell_count + 1, dtype=np.int64)
+        np.cumsum(intervals_per_cell, out=self.interval_offsets[1:])
+        self.interval_starts = np.zeros(self.interval_offsets[-1], dtype=np.float64)
+        self.interval_ends = np.full(self.interval_offsets[-1], INF, dtype=np.float64)
+
+        lead_cells = np.flatnonzero(leading)
+        self.interval_ends[self.interval_offsets[lead_cells]] = group_starts[first_group[lead_cells]]
+
+        rank = np.arange(len(group_cells)) - first_group[group_cells]
+        positions = self.interval_offsets[group_cells] + leading[group_cells] + rank
+        self.interval_starts[positions] = group_ends
+        has_next = np.zeros(len(group_cells), dtype=np.bool_)
+        has_next[:-1] = group_cells[1:] == group_cells[:-1]
+        self.interval_ends[positions[has_next]] = group_starts[1:][has_next[:-1]]
 
     def get_successors(self, node):
         successors = []
@@ -81,7 +234,7 @@ class Map:
                         cost = np.sqrt(2)
 
                     min_time = node.g + cost / 2
-                    max_time = self.map[node.i][node.j][node.interval].end_time
+                    max_time = self.get_interval_end(node.i, node.j, node.interval)
 
                     if min_time >= max_time:
                         continue
@@ -89,9 +242,10 @@ class Map:
                     self.set_intervals(i, j)
 
                     interval = (self.get_safe_interval_id(i, j, min_time))
-                    
-                    while interval < len(self.map[i][j]) and self.map[i][j][interval].start_time < max_time:
-                        successors.append((i, j, cost, self.map[i][j][interval].start_time + cost / 2, interval))
+                    intervals_count = self.get_intervals_count(i, j)
+
+                    while interval < intervals_count and self.get_interval_start(i, j, interval) < max_time:
+                        successors.append((i, j, cost, self.get_interval_start(i, j, interval) + cost / 2, interval))
                         interval += 1
 
         return successors
@@ -114,7 +268,7 @@ class Map:
         return self.cost
 
     def is_traversable(self, i, j):
-        return not self.map[i][j] or self.map[i][j][0].is_safe
+        return not self.grid[i, j]
 
     def get_width(self):
         return self.width
@@ -136,68 +290,253 @@ class Map:
 
         return dist(p1, point) + dist(point, p2) == dist(p1, p2)
 
+    def get_collision_intervals(self, i, j) -> list[Interval]:
+        return [self.__collision_interval(self.dynamic_obstacles[obstacle_id].path, point_i, i, j)
+                for obstacle_id, point_i in self.segment_index.get((i, j), ())]
+
+    def __collision_interval(self, path, point_i, i, j) -> Interval:
+        """
+        Time the segment path[point_i - 1] -> path[point_i] occupies the cell (i, j) it passes through.
+        """
+        collision_interval = Interval(
+            False,
+            path[point_i - 1][2] + self.get_distance(i, j, path[point_i - 1][1], path[point_i - 1][0]) - self.cost / 2,
+            path[point_i - 1][2] + self.get_distance(i, j, path[point_i - 1][1], path[point_i - 1][0]) + self.cost / 2
+        )
+        if self.get_distance(path[point_i - 1][1], path[point_i - 1][0], path[point_i][1], path[point_i][0]) == 0:
+            collision_interval.end_time = path[point_i][2] + self.cost / 2
+        return collision_interval
+
+    def __occupancy(self, path) -> dict:
+        """
+        Maps every cell (i, j) the path passes through to the merged (start, end) times it occupies the cell.
+        """
+        occupancy = {}
+        for point_i, cells in self.__segment_cells(path):
+            for i, j in cells:
+                interval = self.__collision_interval(path, point_i, i, j)
+                occupancy.setdefault((i, j), []).append((interval.start_time, interval.end_time))
+        for cell, intervals in occupancy.items():
+            intervals.sort()
+            merged = [intervals[0]]
+            for start, end in intervals[1:]:
+                if start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            occupancy[cell] = merged
+        return occupancy
+
+    def __covers(self, path, other_path) -> bool:
+        """
+        Whether path occupies every cell at every time other_path does.
+        """
+        occupancy = self.__occupancy(path)
+        return all(any(start <= other_start and other_end <= end for start, end in occupancy.get(cell, ()))
+                   for cell, intervals in self.__occupancy(other_path).items()
+                   for other_start, other_end in intervals)
+
     def set_intervals(self, i, j):
-        if self.map[i][j]:
+        if self.eager or self.map[i][j]:
             return
 
-        collision_intervals: list[Interval] = []
-
-        for obstacle in self.dynamic_obstacles:
-            path = obstacle.path
-            for point_i in range(1, len(path)):
-                if not self.point_on_segment((j, i), [path[point_i - 1][0], path[point_i - 1][1]],
-                                             [path[point_i][0], path[point_i][1]]):
-                    continue
-
-                collision_intervals.append(
-                    Interval(
-                        False,
-                        path[point_i - 1][2] + self.get_distance(i, j, path[point_i - 1][1],
-                                                                   path[point_i - 1][0]) - self.cost / 2,
-                        path[point_i - 1][2] + self.get_distance(i, j, path[point_i - 1][1],
-                                                                   path[point_i - 1][0]) + self.cost / 2
-                    )
-                )
-                if self.get_distance(path[point_i - 1][1], path[point_i - 1][0], path[point_i][1], path[point_i][0]) == 0:
-                    collision_intervals[-1].end_time = path[point_i][2] + self.cost / 2
-                
+        intervals = self.compute_safe_intervals(i, j)
+        self.map[i][j] = intervals
+        self.lazy_intervals += len(intervals)
 
+    def compute_safe_intervals(self, i, j) -> list[Interval]:
+        """
+        Merges the collision intervals of the cell and returns the safe intervals between them.
+        """
+        collision_intervals = self.get_collision_intervals(i, j)
         collision_intervals.sort(key=lambda x: x.start_time)
 
         if not collision_intervals:
-            self.map[i][j].append(Interval(True, 0, INF))
-            return
+            return [Interval(True, 0, INF)]
+
+        intervals: list[Interval] = []
 
         for interval in collision_intervals:
-            if not self.map[i][j] or interval.start_time > self.map[i][j][-1].end_time:
-                self.map[i][j].append(interval)
+            if not intervals or interval.start_time > intervals[-1].end_time:
+                intervals.append(interval)
 
-            self.map[i][j][-1].end_time = max(self.map[i][j][-1].end_time, interval.end_time)
+            intervals[-1].end_time = max(intervals[-1].end_time, interval.end_time)
 
-        if self.map[i][j][0].start_time > 0:
-            self.map[i][j].append(Interval(True, self.map[i][j][-1].end_time, INF))
-            for interval in range(len(self.map[i][j]) - 2, -1, -1):
-                self.map[i][j][interval].is_safe = True
-                self.map[i][j][interval].end_time = self.map[i][j][interval].start_time
-                self.map[i][j][interval].start_time = 0 if interval == 0 else self.map[i][j][interval - 1].end_time
+        if intervals[0].start_time > 0:
+            intervals.append(Interval(True, intervals[-1].end_time, INF))
+            for interval in range(len(intervals) - 2, -1, -1):
+                intervals[interval].is_safe = True
+                intervals[interval].end_time = intervals[interval].start_time
+                intervals[interval].start_time = 0 if interval == 0 else intervals[interval - 1].end_time
         else:
-            for interval in range(len(self.map[i][j])):
-                self.map[i][j][interval].is_safe = True
-                self.map[i][j][interval].start_time = self.map[i][j][interval].end_time
+            for interval in range(len(intervals)):
+                intervals[interval].is_safe = True
+                intervals[interval].start_time = intervals[interval].end_time
 
-                if interval + 1 == len(self.map[i][j]):
-                    self.map[i][j][interval].end_time = INF
+                if interval + 1 == len(intervals):
+                    intervals[interval].end_time = INF
                     continue
 
-                self.map[i][j][interval].end_time = self.map[i][j][interval + 1].start_time
-                
-    
+                intervals[interval].end_time = intervals[interval + 1].start_time
+
+        return intervals
+
+    def get_intervals_count(self, i, j):
+        if self.eager:
+            cell = i * self.width + j
+            return int(self.interval_counts[cell])
+        return len(self.map[i][j])
 
     def get_safe_interval_id(self, i, j, time):
+        if self.eager:
+            cell = i * self.width + j
+            lo = self.interval_offsets[cell]
+            hi = lo + self.interval_counts[cell]
+            return int(bisect.bisect_right(self.interval_ends, time, lo, hi) - lo)
         return bisect.bisect_right(self.map[i][j], time, key=lambda x: x.end_time)
 
     def get_interval_start(self, i, j, interval):
+        if self.eager:
+            return float(self.interval_starts[self.interval_offsets[i * self.width + j] + interval])
         return self.map[i][j][interval].start_time
 
     def get_interval_end(self, i, j, interval):
-        return self.map[i][j][interval].end_time
\ No newline at end of file
+        if self.eager:
+            return float(self.interval_ends[self.interval_offsets[i * self.width + j] + interval])
+        return self.map[i][j][interval].end_time
+
+    def add_obstacle(self, path) -> ObstacleUpdate:
+        """
+        Adds a dynamic obstacle moving along path, a sequence of zero-based
+        (x, y, time) points in the format of the task, and invalidates the safe
+        intervals of the cells it passes through. The new obstacle gets the next id.
+        """
+        self.__check_path(path)
+        self.dynamic_obstacles.append(Obstacle())
+        return self.replace_obstacle(len(self.dynamic_obstacles) - 1, path)
+
+    def remove_obstacle(self, obstacle_id) -> ObstacleUpdate:
+        """
+        Removes the trajectory of the obstacle. Ids of the other obstacles do not change.
+        """
+        return self.replace_obstacle(obstacle_id, [])
+
+    def replace_obstacle(self, obstacle_id, path) -> ObstacleUpdate:
+        """
+        Replaces the trajectory of the obstacle and recomputes the safe intervals of
+        the cells the old or the new trajectory passes through. Other cells, computed
+        lazily or not, are kept. The update is relaxed if the new trajectory leaves some
+        cell free at some time the old one occupied it.
+        """
+        if not 0 <= obstacle_id < len(self.dynamic_obstacles):
+            raise ValueError(f"ERROR: unknown obstacle {obstacle_id}")
+        points = self.__check_path(path)
+        if self.eager and not self.segment_index:
+            for index, obstacle in enumerate(self.dynamic_obstacles):
+                self.__index_obstacle(index, obstacle)
+
+        obstacle = self.dynamic_obstacles[obstacle_id]
+        old_path = obstacle.path
+        cells = set()
+        for _, segment_cells in self.__segment_cells(obstacle.path):
+            cells.update(segment_cells)
+        for cell in cells:
+            entries = [entry for entry in self.segment_index[cell] if entry[0] != obstacle_id]
+            self.index_entries -= len(self.segment_index[cell]) - len(entries)
+            if entries:
+                self.segment_index[cell] = entries
+            else:
+                del self.segment_index[cell]
+
+        obstacle.path = list(map(tuple, (points * np.array([1, 1, self.cost])).tolist()))
+        relaxed = bool(old_path) and not self.__covers(obstacle.path, old_path)
+        self.__index_obstacle(obstacle_id, obstacle)
+        for _, segment_cells in self.__segment_cells(obstacle.path):
+            cells.update(segment_cells)
+
+        cells = {(i, j) for i, j in cells
+                 if 0 <= i < self.height and 0 <= j < self.width and self.is_traversable(i, j)}
+        if self.eager:
+            self.__update_intervals(cells)
+        else:
+            for i, j in cells:
+                self.lazy_intervals -= len(self.map[i][j])
+                self.map[i][j] = []
+        return ObstacleUpdate(obstacle_id, cells, relaxed)
+
+    def __check_path(self, path) -> np.ndarray:
+        points = np.array(path, dtype=np.int64).reshape(-1, 3)
+        _validate_obstacles(points, np.array([0, len(points)]))
+        return points
+
+    def __update_intervals(self, cells):
+        """
+        Recomputes the safe intervals of the given cells and writes them over their old
+        slots, or, if there are more intervals than slots, into twice as many new slots
+        at the end of the arrays. Other cells are not touched, unless the unused slots
+        outnumber the used ones and the arrays are compacted.
+        """
+        if not cells:
+            return
+        if not self.owns_intervals:
+            # The arrays may be a read-only mapped file or shared with other processes
+            self.interval_offsets = self.interval_offsets.copy()
+            self.interval_starts = self.interval_starts.copy()
+            self.interval_ends = self.interval_ends.copy()
+            self.owns_intervals = True
+
+        for i, j in cells:
+            cell = i * self.width + j
+            intervals = self.compute_safe_intervals(i, j)
+            count = len(intervals)
+            capacity = self.interval_capacities.get(cell, int(self.interval_counts[cell]))
+            begin = int(self.interval_offsets[cell])
+            if count > capacity:
+                capacity = 2 * count
+                begin = self.__allocate_intervals(capacity)
+                self.interval_offsets[cell] = begin
+            self.intervals_total += count - int(self.interval_counts[cell])
+            self.interval_counts[cell] = count
+            if capacity > count:
+                self.interval_capacities[cell] = capacity
+            else:
+                self.interval_capacities.pop(cell, None)
+            self.interval_starts[begin:begin + count] = [interval.start_time for interval in intervals]
+            self.interval_ends[begin:begin + count] = [interval.end_time for interval in intervals]
+        self.interval_offsets[-1] = self.interval_size
+
+        if self.interval_size > 2 * self.intervals_total:
+            self.compact_intervals()
+
+    def __allocate_intervals(self, count) -> int:
+        """
+        Reserves count slots at the end of the interval arrays, growing them if needed.
+        """
+        begin = self.interval_size
+        self.interval_size += count
+        if self.interval_size > len(self.interval_starts):
+            size = max(2 * len(self.interval_starts), self.interval_size)
+            for name in ("interval_starts", "interval_ends"):
+                old = getattr(self, name)
+                new = np.full(size, INF, dtype=old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        return begin
+
+    def compact_intervals(self):
+        """
+        Drops the unused slots left by obstacle updates, restoring the CSR layout of
+        the safe intervals, e.g. before the arrays are shared or cached.
+        """
+        if not self.eager or self.intervals_total == self.interval_size == len(self.interval_starts):
+            return
+        counts = self.interval_counts.astype(np.int64)
+        offsets = np.zeros_like(self.interval_offsets)
+        np.cumsum(counts, out=offsets[1:])
+        positions = np.repeat(self.interval_offsets[:-1] - offsets[:-1], counts) + np.arange(offsets[-1])
+        self.interval_starts = self.interval_starts[positions]
+        self.interval_ends = self.interval_ends[positions]
+        self.interval_offsets = offsets
+        self.interval_size = int(offsets[-1])
+        self.interval_capacities = {}
+        self.owns_intervals = True
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Compiled task cache.
+
+A compiled task is a single binary file holding the grid, the obstacle
+trajectories and, optionally, the precomputed safe intervals of a task as raw
+arrays. Arrays are memory-mapped on load, so several processes loading the same
+compiled task share one copy of it in the page cache.
+
+File layout: MAGIC, a little-endian uint64 with the length of a JSON header, the
+header itself and then the arrays, each starting at an ALIGNMENT-aligned offset
+recorded in the header. The header also stores the size, the modification time
+and the SHA-256 of the source XML. The source is hashed on load only when its size
+or modification time differ from the stored ones; a compiled task whose hash does
+not match the source then is considered stale.
+
+Usage:
+    python3 src/task_cache.py task.xml [task.xml ...] -o cache_dir [-intervals]
+"""
+
+from typing import Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from task_loader import Task
+
+MAGIC = b"SIPPTASK"
+VERSION = 3
+ALIGNMENT = 64
+TASK_ARRAYS = ("grid", "obstacle_points", "obstacle_offsets", "agents")
+INTERVAL_ARRAYS = ("interval_offsets", "interval_starts", "interval_ends")
+
+
+class CompiledTask:
+    """
+    Task loaded from the cache.
+
+    Attributes
+    ----------
+    task : Task
+        Task whose arrays are read-only views of the mapped file.
+    intervals : tuple[np.ndarray, np.ndarray, np.ndarray] | None
+        Safe intervals in CSR layout (offsets, starts, ends), if they were compiled.
+    cost : int | float
+        Move cost the intervals were computed with.
+    """
+
+    def __init__(self, task: Task, intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]], cost):
+        self.task = task
+        self.intervals = intervals
+        self.cost = cost
+
+
+def source_hash(task_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(task_path, 'rb') as task_file:
+        for chunk in iter(lambda: task_file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_stat(task_path: str) -> Tuple[int, int]:
+    """
+    Size and modification time in nanoseconds of the source XML.
+    """
+    stat = os.stat(task_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def get_cache_path(task_path: str, cache_dir: str) -> str:
+    """
+    Path of the compiled task: its name and a short hash of the absolute path of the
+    source, so tasks with the same name in different directories get different files.
+    """
+    name = os.path.splitext(os.path.basename(task_path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(task_path).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}_{path_hash}.sippc")
+
+
+def compile_task(task_path: str, cache_dir: str, task: Task,
+                 intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None, cost=1) -> str:
+    """
+    Writes the task (and the safe intervals, if given) into cache_dir. The file is
+    written next to its final location and atomically renamed, so concurrent
+    readers never see a partially written file.
+    """
+    arrays: Dict[str, np.ndarray] = {name: getattr(task, name) for name in TASK_ARRAYS}
+    if intervals is not None:
+        arrays.update(zip(INTERVAL_ARRAYS, intervals))
+
+    # Stat before hashing: a source changed in between then fails the stat check and is hashed
+    size, mtime_ns = source_stat(task_path)
+    header = {
+        "version": VERSION,
+        "source_size": size,
+        "source_mtime_ns": mtime_ns,
+        "source_hash": source_hash(task_path),
+        "width": task.width,
+        "height": task.height,
+        "start": list(task.start),
+        "finish": list(task.finish),
+        "cost": cost,
+        "arrays": {},
+    }
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = get_cache_path(task_path, cache_dir)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as cache_file:
+        cache_file.write(MAGIC)
+        cache_file.write(len(header_bytes).to_bytes(8, "little"))
+        cache_file.write(header_bytes)
+        for name, array in arrays.items():
+            cache_file.seek(data_start + header["arrays"][name]["offset"])
+            cache_file.write(array.tobytes())
+        cache_file.truncate(data_start + offset)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def load_compiled_task(task_path: str, cache_dir: str) -> Optional[CompiledTask]:
+    """
+    Maps the compiled task of task_path from cache_dir.
+    Returns None if there is no compiled task or it is stale. The source is hashed only
+    if its size or modification time differ from the ones it was compiled from.
+    """
+    cache_path = get_cache_path(task_path, cache_dir)
+    if not os.path.exists(cache_path):
+        return None
+
+    with open(cache_path, 'rb') as cache_file:
+        if cache_file.read(len(MAGIC)) != MAGIC:
+            return None
+        header_length = int.from_bytes(cache_file.read(8), "little")
+        header = json.loads(cache_file.read(header_length))
+    if header["version"] != VERSION:
+        return None
+    if list(source_stat(task_path)) != [header["source_size"], header["source_mtime_ns"]] and \
+            header["source_hash"] != source_hash(task_path):
+        return None
+
+    data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+    data = np.memmap(cache_path, dtype=np.uint8, mode='r')
+
+    def view(name):
+        descr = header["arrays"][name]
+        dtype = np.dtype(descr["dtype"])
+        begin = data_start + descr["offset"]
+        end = begin + int(np.prod(descr["shape"], dtype=np.int64)) * dtype.itemsize
+        return data[begin:end].view(dtype).reshape(descr["shape"])
+
+    task = Task()
+    task.width, task.height = header["width"], header["height"]
+    task.start, task.finish = tuple(header["start"]), tuple(header["finish"])
+    for name in TASK_ARRAYS:
+        setattr(task, name, view(name))
+
+    intervals = None
+    if all(name in header["arrays"] for name in INTERVAL_ARRAYS):
+        intervals = tuple(view(name) for name in INTERVAL_ARRAYS)
+    return CompiledTask(task, intervals, header["cost"])
+
+
+if __name__ == "__main__":
+    from sipp_map import Map
+
+    if "-o" not in sys.argv or sys.argv.index("-o") + 1 >= len(sys.argv):
+        print("Error: cache directory is not specified")
+        sys.exit()
+
+    index = sys.argv.index("-o")
+    cache_dir = sys.argv[index + 1]
+    del sys.argv[index:index + 2]
+    with_intervals = "-intervals" in sys.argv
+    if with_intervals:
+        sys.argv.remove("-intervals")
+
+    for task_path in sys.argv[1:]:
+        Map(task_path, eager=with_intervals, cache_dir=cache_dir)
+        print(get_cache_path(task_path, cache_dir))
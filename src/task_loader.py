@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional
+from array import array
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+class Task:
+    """
+    Flat representation of a task (and, optionally, of the log written for it).
+
+    Attributes
+    ----------
+    width, height : int
+        Size of the grid.
+    start, finish : tuple[int, int]
+        Zero-based (x, y) coordinates of the agent start and finish cells.
+    grid : np.ndarray
+        Boolean array of shape (height, width), True for blocked cells.
+    obstacle_points : np.ndarray
+        Array of shape (N, 3) with zero-based (x, y, time) points of all obstacles.
+    obstacle_offsets : np.ndarray
+        Points of the k-th obstacle are obstacle_points[obstacle_offsets[k]:obstacle_offsets[k + 1]].
+    summary : dict | None
+        Attributes of the <summary> tag of the log, if present.
+    path_points : np.ndarray | None
+        Array of shape (M, 3) with zero-based (x, y, time) points of the log path, if present.
+    agents : np.ndarray
+        Array of shape (K, 4) with zero-based (startx, starty, finishx, finishy) of the agents
+        of a multi-agent task, empty for a single-agent one.
+    agent_paths : dict[int, np.ndarray] | None
+        Paths of a multi-agent log (the <path> tags with an agent attribute) by agent id,
+        in the layout of path_points. path_points then holds the last of them.
+    """
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.start = (0, 0)
+        self.finish = (0, 0)
+        self.grid: Optional[np.ndarray] = None
+        self.obstacle_points = np.zeros((0, 3), dtype=np.int64)
+        self.obstacle_offsets = np.zeros(1, dtype=np.int64)
+        self.summary: Optional[Dict[str, str]] = None
+        self.path_points: Optional[np.ndarray] = None
+        self.agents = np.zeros((0, 4), dtype=np.int64)
+        self.agent_paths: Optional[Dict[int, np.ndarray]] = None
+
+    @property
+    def obstacles_count(self) -> int:
+        return len(self.obstacle_offsets) - 1
+
+    def obstacle_path(self, obstacle_id: int) -> np.ndarray:
+        return self.obstacle_points[self.obstacle_offsets[obstacle_id]:self.obstacle_offsets[obstacle_id + 1]]
+
+
+def _validate_obstacles(points: np.ndarray, offsets: np.ndarray):
+    """
+    Checks that consecutive points of every obstacle either form a straight move whose
+    duration equals its length, or a wait of positive duration.
+    """
+    if len(points) < 2:
+        return
+    boundaries = offsets[1:-1]
+    same_obstacle = np.ones(len(points) - 1, dtype=np.bool_)
+    same_obstacle[boundaries[(boundaries > 0) & (boundaries < len(points))] - 1] = False
+    distance = np.abs(np.diff(points[:, 0])) + np.abs(np.diff(points[:, 1]))
+    duration = np.diff(points[:, 2])
+    invalid = ((distance == 0) & (duration <= 0)) | ((distance != 0) & (distance != duration))
+    if (invalid & same_obstacle).any():
+        raise ValueError("ERROR: invalid path representation")
+
+
+def load_task(task_path: str) -> Task:
+    """
+    Loads a task (or a log, which embeds the task or references it with <task file="..."/>)
+    with an incremental XML parser. Rows of the grid are written straight into a NumPy
+    array and points of the obstacles into a flat buffer, so no document tree is ever
+    kept in memory.
+    """
+    task = Task()
+    header: Dict[str, int] = {}
+    has_map = has_grid = False
+    row_i = 0
+    points = array("q")
+    agents = array("q")
+    offsets: List[int] = [0]
+    path_points = None
+    path_agent = None
+    agent_paths: Dict[int, np.ndarray] = {}
+    task_reference = None
+    in_obstacle = in_path = False
+
+    for event, element in ET.iterparse(task_path, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == "map":
+                has_map = True
+            elif tag == "grid":
+                has_grid = True
+                if not header.get("width", 0) > 0 or not header.get("height", 0) > 0:
+                    raise ValueError("ERROR: invalid value of the width, height, start of goal position")
+                task.grid = np.zeros((header["height"], header["width"]), dtype=np.bool_)
+            elif tag == "obstacle":
+                in_obstacle = True
+            elif tag == "path":
+                in_path = True
+                path_points = array("d")
+                path_agent = element.get("agent")
+            continue
+
+        if tag in ("width", "height", "startx", "starty", "finishx", "finishy"):
+            header[tag] = int(element.text)
+        elif tag == "row":
+            row = (element.text or "").split()
+            if row_i >= len(task.grid):
+                raise ValueError(f"ERROR: the grid has more rows than its height {len(task.grid)}")
+            if len(row) != task.grid.shape[1]:
+                raise ValueError(f"ERROR: row {row_i + 1} of the grid has {len(row)} cells "
+                                 f"instead of the width {task.grid.shape[1]}")
+            task.grid[row_i] = np.array(row, dtype=np.int64) != 0
+            row_i += 1
+        elif tag == "point":
+            if in_obstacle:
+                points.extend((int(element.get("x")) - 1, int(element.get("y")) - 1, int(element.get("time"))))
+            elif in_path:
+                path_points.extend((int(element.get("x")) - 1, int(element.get("y")) - 1, float(element.get("time"))))
+        elif tag == "agent":
+            try:
+                agents.extend(int(element.get(name)) - 1 for name in ("startx", "starty", "finishx", "finishy"))
+            except (TypeError, ValueError):
+                raise ValueError("ERROR: invalid agent representation")
+        elif tag == "obstacle":
+            in_obstacle = False
+            offsets.append(len(points) // 3)
+        elif tag == "path":
+            in_path = False
+            if path_agent is not None:
+                agent_paths[int(path_agent)] = np.frombuffer(path_points, dtype=np.float64).reshape(-1, 3)
+        elif tag == "summary":
+            task.summary = dict(element.attrib)
+        elif tag == "task":
+            task_reference = element.get("file")
+        element.clear()
+
+    if not has_map and task_reference is not None:
+        referenced = load_task(os.path.join(os.path.dirname(task_path), task_reference))
+        referenced.summary = task.summary
+        if path_points is not None:
+            referenced.path_points = np.frombuffer(path_points, dtype=np.float64).reshape(-1, 3)
+        referenced.agent_paths = agent_paths or None
+        return referenced
+
+    if not has_map:
+        raise ValueError("ERROR: nothing in map tag")
+    task.agents = np.frombuffer(agents, dtype=np.int64).reshape(-1, 4)
+    if len(task.agents) and "startx" not in header:
+        # A multi-agent task may omit the single agent, which then is the first one
+        header.update(zip(("startx", "starty", "finishx", "finishy"), (task.agents[0] + 1).tolist()))
+    data_ptrs = [header.get(tag) for tag in ("width", "height", "startx", "starty", "finishx", "finishy")]
+    for data_ptr in data_ptrs:
+        if data_ptr is None or data_ptr <= 0:
+            raise ValueError("ERROR: invalid value of the width, height, start of goal position")
+    if not has_grid:
+        raise ValueError("ERROR: nothing in grid tag")
+    if row_i != len(task.grid):
+        raise ValueError(f"ERROR: the grid has {row_i} rows instead of the height {len(task.grid)}")
+
+    task.width, task.height = data_ptrs[0], data_ptrs[1]
+    task.start = (data_ptrs[2] - 1, data_ptrs[3] - 1)
+    task.finish = (data_ptrs[4] - 1, data_ptrs[5] - 1)
+    task.obstacle_points = np.frombuffer(points, dtype=np.int64).reshape(-1, 3)
+    task.obstacle_offsets = np.array(offsets, dtype=np.int64)
+    if path_points is not None:
+        task.path_points = np.frombuffer(path_points, dtype=np.float64).reshape(-1, 3)
+    task.agent_paths = agent_paths or None
+
+    _validate_obstacles(task.obstacle_points, task.obstacle_offsets)
+    return task
@@ -0,0 +1,166 @@
+"""
+Logs and trajectories of found paths.
+
+XML logs keep the layout of the planner logs: the task followed by a <log> section
+with the summary and the path. The task is copied from its file in chunks, or
+only referenced with <task file="..."/> (relative to the log), which load_task
+follows. The path can be collapsed into the form of the obstacle trajectories of
+the task: a wait becomes one segment between two points in the same cell, and
+consecutive moves in the same direction become one segment.
+
+Binary trajectories are .npz files with the collapsed path, the summary and the
+arrays of the task, so they are loaded without any XML parsing.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+import json
+import os
+
+import numpy as np
+
+from task_loader import Task, load_task
+
+COPY_CHUNK = 1 << 20
+TRAJECTORY_ARRAYS = ("grid", "obstacle_points", "obstacle_offsets", "agents")
+
+
+def result_points(result) -> np.ndarray:
+    """
+    Zero-based (x, y, time) points of the nodes of the path of a SearchResult.
+    """
+    return np.array([(node.j, node.i, node.g) for node in result.path], dtype=np.float64).reshape(-1, 3)
+
+
+def collapse_path(points: np.ndarray, cost=1) -> np.ndarray:
+    """
+    Collapses a path of adjacent nodes into segments of the task format. Before every
+    move that arrives later than the move itself takes, the agent waits in its cell,
+    so a wait point is inserted there; then points between two segments of the same
+    kind (a wait or a move in one direction) are dropped.
+    """
+    if len(points) < 2:
+        return points
+    delta = np.diff(points, axis=0)
+    move_time = (np.abs(delta[:, 0]) + np.abs(delta[:, 1])) * cost
+    waits = np.flatnonzero(delta[:, 2] > move_time)
+    wait_points = points[waits].copy()
+    wait_points[:, 2] = points[waits + 1, 2] - move_time[waits]
+    points = np.insert(points, waits + 1, wait_points, axis=0)
+
+    direction = np.sign(np.diff(points[:, :2], axis=0))
+    keep = np.ones(len(points), dtype=np.bool_)
+    keep[1:-1] = (direction[1:] != direction[:-1]).any(axis=1)
+    return points[keep]
+
+
+def _format_value(value) -> str:
+    return f"{value:.6f}" if isinstance(value, float) else str(value)
+
+
+def _task_end(task_file) -> Tuple[int, bytes]:
+    """
+    Offset and contents of the last line of the task file, the one with the closing </root> tag.
+    """
+    size = task_file.seek(0, os.SEEK_END)
+    task_file.seek(max(size - 4096, 0))
+    tail = task_file.read()
+    if tail.rfind(b"</root>") < 0:
+        raise ValueError("ERROR: nothing in root tag")
+    begin = tail.rfind(b"\n", 0, len(tail) - 1 if tail.endswith(b"\n") else len(tail)) + 1
+    return size - len(tail) + begin, tail[begin:]
+
+
+def write_xml_log(task_path: str, log_path: str, points: np.ndarray, summary: dict, reference: bool = False):
+    """
+    Writes the log of a path of zero-based (x, y, time) points. With reference the task
+    is not copied but referenced by its path relative to the log.
+    summary is written as the attributes of the <summary> tag.
+    The layout and the number formats are those of the original planner logs: the
+    task without its last line, an empty line, the <log> section, and the last line
+    followed by an empty line; times are written as str() writes them.
+    """
+    write_xml_paths_log(task_path, log_path, [({}, points)], summary, reference)
+
+
+def write_xml_paths_log(task_path: str, log_path: str, paths: List[Tuple[dict, np.ndarray]], summary: dict,
+                        reference: bool = False):
+    """
+    Writes the log of several paths, e.g. one per agent, in the layout of write_xml_log.
+    paths holds (attributes of the <path> tag, zero-based (x, y, time) points) pairs.
+    """
+    with open(log_path, 'wb') as f:
+        if reference:
+            task_file = os.path.relpath(task_path, os.path.dirname(os.path.abspath(log_path)))
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<root>\n    <task file="{task_file}"/>\n'.encode())
+            last_line = b"</root>\n"
+        else:
+            with open(task_path, 'rb') as task_file:
+                remaining, last_line = _task_end(task_file)
+                task_file.seek(0)
+                while remaining > 0:
+                    chunk = task_file.read(min(COPY_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            f.write(b"\n")
+
+        f.write(f"    <log>\n        <summary{_attributes(summary)}/>\n".encode())
+        for attributes, points in paths:
+            f.write(f"        <path{_attributes(attributes)}>\n".encode())
+            f.writelines(line.encode() for line in _point_lines(points))
+            f.write(b"         </path>\n")
+        f.write(b"    </log>\n" + last_line + b"\n")
+
+
+def _attributes(values: dict) -> str:
+    return "".join(f" {name}=\"{_format_value(value)}\"" for name, value in values.items())
+
+
+def _point_lines(points) -> Iterable[str]:
+    for x, y, time in (points.tolist() if isinstance(points, np.ndarray) else points):
+        yield f"            <point x=\"{int(x) + 1}\" y=\"{int(y) + 1}\" time=\"{time}\"/>\n"
+
+
+def save_trajectory(trajectory_path: str, task: Task, points: np.ndarray, summary: dict,
+                    task_path: Optional[str] = None):
+    """
+    Writes the path and the task into a compressed .npz file.
+    """
+    arrays = {name: getattr(task, name) for name in TRAJECTORY_ARRAYS}
+    header = {
+        "width": task.width,
+        "height": task.height,
+        "start": list(task.start),
+        "finish": list(task.finish),
+        "task": task_path,
+        "summary": {name: _format_value(value) for name, value in summary.items()},
+    }
+    with open(trajectory_path, 'wb') as f:
+        np.savez_compressed(f, path=np.asarray(points, dtype=np.float64), header=np.array(json.dumps(header)),
+                            **arrays)
+
+
+def load_trajectory(trajectory_path: str) -> Task:
+    """
+    Loads a .npz trajectory into a Task with path_points and summary set.
+    """
+    with np.load(trajectory_path) as data:
+        header = json.loads(str(data["header"]))
+        task = Task()
+        for name in TRAJECTORY_ARRAYS:
+            setattr(task, name, data[name])
+        task.path_points = data["path"]
+    task.width, task.height = header["width"], header["height"]
+    task.start, task.finish = tuple(header["start"]), tuple(header["finish"])
+    task.summary = header["summary"]
+    return task
+
+
+def load_log(log_path: str) -> Task:
+    """
+    Loads an XML log or a .npz trajectory.
+    """
+    if log_path.endswith(".npz"):
+        return load_trajectory(log_path)
+    return load_task(log_path)
@@ -33,4 +33,23 @@ class PathComponent:
 
 class Obstacle:
     def __init__(self):
-        self.path = []
\ No newline at end of file
+        self.path = []
+
+class ObstacleUpdate:
+    """
+    Result of adding, removing or replacing an obstacle trajectory of a Map.
+
+    Attributes
+    ----------
+    obstacle_id : int
+        Id of the changed obstacle.
+    cells : set[tuple[int, int]]
+        Free cells (i, j) whose safe intervals were invalidated.
+    relaxed : bool
+        Whether some collision intervals were removed, so safe intervals may have grown.
+    """
+
+    def __init__(self, obstacle_id: int, cells: set, relaxed: bool):
+        self.obstacle_id = obstacle_id
+        self.cells = cells
+        self.relaxed = relaxed
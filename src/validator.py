@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Path validator.
+
+Checks a path of the agent against the static grid and all dynamic obstacles of
+the task. The agent is expected to start at the start of the task at time 0 and
+end at its finish; between consecutive points it waits and then moves along a
+straight line at unit speed, and every obstacle moves at unit speed along its
+segments and disappears after its last point.
+
+Collisions follow the semantics of Map.set_intervals: a body occupies the cell
+whose center is within cost/2 of it, so a body passing the center of a cell at
+time t occupies it during [t - cost/2, t + cost/2]. The agent and the obstacles
+are discretized on a common time grid with the given step, and a vertex conflict
+is the agent and an obstacle in the same cell at a grid time. When all times are
+multiples of cost (as in the tasks of data/), sampling every cost finds exactly
+the conflicts of positive duration, which is the default. Two bodies exchanging
+cells only touch on the boundary of the cells, so swaps are checked separately:
+an edge conflict is an obstacle moving from the next cell of the agent into its
+current one between two consecutive grid times.
+
+Obstacle segments that never touch a cell visited by the agent are dropped before
+the positions are sampled, and all the checks are done with NumPy on the flat
+arrays of Task, without a loop over the obstacles.
+
+Paths of a multi-agent log are checked one by one against the endpoints of their
+agents, with the other agents as obstacles that stay at their goals.
+
+Usage:
+    python3 src/validator.py log.xml | trajectory.npz | logs_dir [...] [-step s] [-stay-at-goal]
+"""
+
+from typing import List, Optional
+import copy
+import glob
+import os
+import sys
+
+import numpy as np
+
+from task_loader import Task
+from sipp_map import INF
+from trajectory import collapse_path, load_log
+
+
+class Conflict:
+    """
+    A conflict of the path.
+
+    Attributes
+    ----------
+    kind : str
+        vertex or edge for conflicts with obstacles; start, finish, continuity or
+        static for errors of the path itself.
+    time : float
+        Time of the conflict (the first grid time of a run of vertex conflicts).
+    x, y : int
+        Zero-based cell of the agent at that time.
+    obstacle_id : int | None
+        Id of the obstacle, for vertex and edge conflicts with the obstacles of the task.
+    agent : int | None
+        Agent whose path has the conflict, for multi-agent logs.
+    other_agent : int | None
+        The other agent, for vertex and edge conflicts between agents.
+    """
+
+    def __init__(self, kind: str, time: float, x: int, y: int, obstacle_id: Optional[int] = None,
+                 agent: Optional[int] = None, other_agent: Optional[int] = None):
+        self.kind = kind
+        self.time = time
+        self.x = x
+        self.y = y
+        self.obstacle_id = obstacle_id
+        self.agent = agent
+        self.other_agent = other_agent
+
+    def __str__(self):
+        prefix = f"agent {self.agent}: " if self.agent is not None else ""
+        obstacle = f" obstacle={self.obstacle_id}" if self.obstacle_id is not None else ""
+        other = f" agent={self.other_agent}" if self.other_agent is not None else ""
+        return f"{prefix}{self.kind} conflict at x={self.x + 1} y={self.y + 1} time={self.time:g}{obstacle}{other}"
+
+
+class ValidationResult:
+    """
+    Conflicts of a path, sorted by time, and the number of grid times and
+    (obstacle, time) samples checked.
+    """
+
+    def __init__(self, conflicts: List[Conflict], samples: int = 0, obstacle_samples: int = 0):
+        self.conflicts = conflicts
+        self.samples = samples
+        self.obstacle_samples = obstacle_samples
+
+    @property
+    def valid(self) -> bool:
+        return not self.conflicts
+
+
+def _positions(points: np.ndarray, times: np.ndarray, cost: float) -> np.ndarray:
+    """
+    Cells (x, y) of the agent at the times: it waits at a point and moves to the next
+    one during the last distance * cost before the time of the next point.
+    """
+    segment = np.clip(np.searchsorted(points[:, 2], times, side='right') - 1, 0, max(len(points) - 2, 0))
+    begin, end = points[segment], points[np.minimum(segment + 1, len(points) - 1)]
+    delta = end[:, :2] - begin[:, :2]
+    distance = np.abs(delta).sum(axis=1)
+    moved = np.clip(times - (end[:, 2] - distance * cost), 0, distance * cost) / cost
+    direction = np.sign(delta)
+    return np.floor(begin[:, :2] + direction * moved[:, None] + 0.5).astype(np.int64)
+
+
+def _path_errors(task: Task, path: np.ndarray, cost: float) -> List[Conflict]:
+    conflicts = []
+    x, y, t = path[0]
+    if (int(x), int(y)) != tuple(task.start) or t != 0:
+        conflicts.append(Conflict("start", t, int(x), int(y)))
+    x, y, t = path[-1]
+    if (int(x), int(y)) != tuple(task.finish):
+        conflicts.append(Conflict("finish", t, int(x), int(y)))
+
+    delta = np.diff(path, axis=0)
+    distance = np.abs(delta[:, 0]) + np.abs(delta[:, 1])
+    invalid = ((delta[:, 0] != 0) & (delta[:, 1] != 0)) | (delta[:, 2] <= 0) | (delta[:, 2] < distance * cost)
+    for index in np.flatnonzero(invalid):
+        conflicts.append(Conflict("continuity", path[index + 1, 2], int(path[index + 1, 0]), int(path[index + 1, 1])))
+    return conflicts
+
+
+def validate_path(task: Task, path: np.ndarray, cost: float = 1.0, step: Optional[float] = None,
+                  stay_at_goal: bool = False) -> ValidationResult:
+    """
+    Validates the path, an (N, 3) array of zero-based (x, y, time) points, against the task.
+    step is the step of the time grid (cost by default). With stay_at_goal the agent stays
+    at its last cell after the path ends, until all obstacles stop.
+    """
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 3)
+    if not len(path):
+        return ValidationResult([])
+    step = cost if step is None else step
+    conflicts = _path_errors(task, path, cost)
+
+    points = task.obstacle_points.astype(np.float64) * np.array([1, 1, cost])
+    offsets = task.obstacle_offsets
+    finite_times = points[points[:, 2] < INF, 2]
+    end_time = path[-1, 2]
+    if stay_at_goal and len(finite_times):
+        end_time = max(end_time, finite_times.max() + cost)
+
+    # The agent on the time grid
+    times = np.arange(int(np.floor(end_time / step + 1e-9)) + 1) * step
+    agent = _positions(path, times, cost)
+    width, height = task.width, task.height
+    inside = (agent[:, 0] >= 0) & (agent[:, 0] < width) & (agent[:, 1] >= 0) & (agent[:, 1] < height)
+    blocked = ~inside
+    blocked[inside] = task.grid[agent[inside, 1], agent[inside, 0]]
+    blocked_runs = blocked.copy()
+    blocked_runs[1:] &= ~blocked[:-1]
+    for index in np.flatnonzero(blocked_runs):
+        conflicts.append(Conflict("static", times[index], int(agent[index, 0]), int(agent[index, 1])))
+    agent_cells = np.where(blocked, -1, agent[:, 1] * width + agent[:, 0])
+
+    # Segments of the obstacles: every point up to the next point of the obstacle, the last one only at its time
+    count = len(points)
+    obstacle_ids = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    last = np.zeros(count, dtype=np.bool_)
+    last[offsets[1:][np.diff(offsets) > 0] - 1] = True
+    following = np.where(last, np.arange(count), np.minimum(np.arange(count) + 1, count - 1))
+    begin, end = points, points[following]
+    first_sample = np.ceil(begin[:, 2] / step - 1e-9)
+    stop_sample = np.where(last, np.floor(begin[:, 2] / step + 1e-9) + 1, np.ceil(end[:, 2] / step - 1e-9))
+    first_sample = np.clip(first_sample, 0, len(times)).astype(np.int64)
+    stop_sample = np.clip(stop_sample, 0, len(times)).astype(np.int64)
+
+    # Keep the segments that pass through a cell visited by the agent
+    visited = np.zeros(width * height, dtype=np.bool_)
+    visited[agent_cells[agent_cells >= 0]] = True
+    direction = np.sign(end[:, :2] - begin[:, :2]).astype(np.int64)
+    distance = np.abs(end[:, :2] - begin[:, :2]).sum(axis=1).astype(np.int64)
+    candidates = np.flatnonzero(stop_sample > first_sample)
+    cell_segments = np.repeat(candidates, distance[candidates] + 1)
+    cell_steps = np.arange(len(cell_segments)) - np.repeat(np.cumsum(distance[candidates] + 1) - distance[candidates] - 1,
+                                                           distance[candidates] + 1)
+    cells = begin[cell_segments, :2].astype(np.int64) + direction[cell_segments] * cell_steps[:, None]
+    on_grid = (cells[:, 0] >= 0) & (cells[:, 0] < width) & (cells[:, 1] >= 0) & (cells[:, 1] < height)
+    cell_segments, cells = cell_segments[on_grid], cells[on_grid]
+    touching = np.zeros(count, dtype=np.bool_)
+    touching[cell_segments[visited[cells[:, 1] * width + cells[:, 0]]]] = True
+    kept = np.flatnonzero(touching)
+
+    # Obstacles of the kept segments on the time grid
+    samples_count = stop_sample[kept] - first_sample[kept]
+    sample_segments = np.repeat(kept, samples_count)
+    samples = first_sample[sample_segments] + np.arange(len(sample_segments)) - \
+        np.repeat(np.cumsum(samples_count) - samples_count, samples_count)
+    moved = np.clip(times[samples] - begin[sample_segments, 2], 0, distance[sample_segments] * cost) / cost
+    positions = np.floor(begin[sample_segments, :2] + direction[sample_segments] * moved[:, None] + 0.5)
+    obstacle_cells = positions[:, 1].astype(np.int64) * width + positions[:, 0].astype(np.int64)
+    sample_obstacles = obstacle_ids[sample_segments]
+
+    # Vertex conflicts, one per run of consecutive grid times
+    hits = np.flatnonzero(obstacle_cells == agent_cells[samples])
+    order = np.lexsort((samples[hits], sample_obstacles[hits]))
+    hit_obstacles, hit_samples = sample_obstacles[hits][order], samples[hits][order]
+    starts = np.ones(len(hits), dtype=np.bool_)
+    starts[1:] = (hit_obstacles[1:] != hit_obstacles[:-1]) | (hit_samples[1:] != hit_samples[:-1] + 1)
+    for obstacle_id, sample in zip(hit_obstacles[starts], hit_samples[starts]):
+        conflicts.append(Conflict("vertex", times[sample], int(agent[sample, 0]), int(agent[sample, 1]),
+                                  int(obstacle_id)))
+
+    # Edge conflicts: the obstacle is in the next cell of the agent and then in its current cell
+    keys = sample_obstacles * len(times) + samples
+    order = np.argsort(keys, kind='stable')
+    keys, key_cells = keys[order], obstacle_cells[order]
+    moving = np.zeros(len(times), dtype=np.bool_)
+    moving[:-1] = agent_cells[:-1] != agent_cells[1:]
+    next_cells = np.append(agent_cells[1:], -1)
+    candidates = np.flatnonzero(moving[samples] & (obstacle_cells == next_cells[samples]))
+    next_keys = sample_obstacles[candidates] * len(times) + samples[candidates] + 1
+    found = np.minimum(np.searchsorted(keys, next_keys), len(keys) - 1)
+    swaps = candidates[(keys[found] == next_keys) & (key_cells[found] == agent_cells[samples[candidates]])]
+    for index in swaps:
+        sample = samples[index]
+        conflicts.append(Conflict("edge", times[sample], int(agent[sample, 0]), int(agent[sample, 1]),
+                                  int(sample_obstacles[index])))
+
+    conflicts.sort(key=lambda conflict: conflict.time)
+    return ValidationResult(conflicts, len(times), len(samples))
+
+
+def validate_result(task_map, result, stay_at_goal: bool = False) -> ValidationResult:
+    """
+    Validates the path of a SearchResult against the task of the map.
+    """
+    path = [(node.j, node.i, node.g) for node in result.path]
+    return validate_path(task_map.task, np.array(path, dtype=np.float64), task_map.cost, stay_at_goal=stay_at_goal)
+
+
+def validate_agents(task: Task, cost: float = 1.0, step: Optional[float] = None,
+                    stay_at_goal: bool = True) -> ValidationResult:
+    """
+    Validates the paths of a multi-agent log (task.agent_paths). Every path is checked
+    against the endpoints of its agent, with the paths of the other agents added to the
+    obstacles of the task; as in multi_agent.reserve_path, a planned agent stays at its
+    goal forever. Agents without a path are skipped.
+    """
+    paths = {agent: path for agent, path in task.agent_paths.items() if len(path)}
+    if any(agent >= len(task.agents) for agent in paths):
+        raise ValueError("ERROR: a path of the log belongs to no agent of the task")
+    trajectories = {}
+    for agent, path in paths.items():
+        trajectory = collapse_path(path, cost) / np.array([1, 1, cost])
+        trajectories[agent] = np.vstack((trajectory, [trajectory[-1, 0], trajectory[-1, 1], INF]))
+
+    conflicts, samples, obstacle_samples = [], 0, 0
+    base_count = task.obstacles_count
+    for agent, path in paths.items():
+        others = [other for other in paths if other != agent]
+        agent_task = copy.copy(task)
+        agent_task.start, agent_task.finish = tuple(task.agents[agent, :2]), tuple(task.agents[agent, 2:])
+        agent_task.obstacle_points = np.vstack([task.obstacle_points.astype(np.float64)] +
+                                               [trajectories[other] for other in others])
+        lengths = np.array([len(trajectories[other]) for other in others], dtype=np.int64)
+        agent_task.obstacle_offsets = np.concatenate((task.obstacle_offsets,
+                                                      task.obstacle_offsets[-1] + np.cumsum(lengths)))
+        result = validate_path(agent_task, path, cost, step, stay_at_goal)
+        for conflict in result.conflicts:
+            conflict.agent = agent
+            if conflict.obstacle_id is not None and conflict.obstacle_id >= base_count:
+                conflict.obstacle_id, conflict.other_agent = None, others[conflict.obstacle_id - base_count]
+        conflicts.extend(result.conflicts)
+        samples += result.samples
+        obstacle_samples += result.obstacle_samples
+    conflicts.sort(key=lambda conflict: conflict.time)
+    return ValidationResult(conflicts, samples, obstacle_samples)
+
+
+def validate_log(log_path: str, step: Optional[float] = None, stay_at_goal: bool = False) -> ValidationResult:
+    """
+    Validates the path of a log (or a .npz trajectory) written by the planner against its task,
+    or all the paths of a multi-agent log (see validate_agents, where agents always stay at their goals).
+    """
+    task = load_log(log_path)
+    if task.agent_paths is not None:
+        return validate_agents(task, step=step)
+    if task.path_points is None:
+        raise ValueError("ERROR: the log has no path")
+    return validate_path(task, task.path_points, step=step, stay_at_goal=stay_at_goal)
+
+
+def get_option(name: str, default=None):
+    if name not in sys.argv:
+        return default
+    index = sys.argv.index(name)
+    if index + 1 >= len(sys.argv):
+        return default
+    return sys.argv[index + 1]
+
+
+def main():
+    paths, skip = [], False
+    for arg in sys.argv[1:]:
+        if skip:
+            skip = False
+        elif arg == "-step":
+            skip = True
+        elif not arg.startswith("-"):
+            paths.append(arg)
+
+    log_paths = []
+    for path in paths:
+        log_paths.extend(sorted(glob.glob(os.path.join(path, "*.xml")) + glob.glob(os.path.join(path, "*.npz")))
+                         if os.path.isdir(path) else [path])
+    if not log_paths:
+        print("Error: input file is not specified")
+        sys.exit(2)
+
+    step = get_option("-step")
+    invalid = 0
+    for log_path in log_paths:
+        try:
+            result = validate_log(log_path, float(step) if step is not None else None, "-stay-at-goal" in sys.argv)
+        except (OSError, ValueError, SyntaxError) as e:
+            print(f"{log_path}: error {e}")
+            invalid += 1
+            continue
+        print(f"{log_path}: {'ok' if result.valid else 'INVALID'} samples={result.samples} "
+              f"obstacle_samples={result.obstacle_samples}")
+        for conflict in result.conflicts:
+            print(f"    {conflict}")
+        invalid += not result.valid
+    sys.exit(1 if invalid else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,112 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from bs4 import BeautifulSoup
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import matplotlib.animation as animation
 import numpy as np
 from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import shutil
+import subprocess
 import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from trajectory import load_log
 
 
 class Map:
     def __init__(self, xml_file):
         print("start init")
-        with open(xml_file, 'r') as xml_file:
-            soup = BeautifulSoup(xml_file, "lxml")
-        
+        task = load_log(xml_file)
 
-        self.width = int(soup.width.text)
-        self.height = int(soup.height.text)
-        self.start = [int(soup.startx.text) - 1, int(soup.starty.text) - 1]
-        self.finish = [int(soup.finishx.text) - 1, int(soup.finishy.text) - 1]
-        self.grid = [
-            [int(cell) for cell in row.text.split(' ')]
-            for row in soup.find_all('row')
-        ]
-        
+        self.width = task.width
+        self.height = task.height
+        self.start = list(task.start)
+        self.finish = list(task.finish)
+        self.grid = task.grid.astype(np.uint8)
 
-        self.obstacles = [
-            [
-                [int(point['x']) - 1, int(point['y']) - 1, float(point['time'])]
-                for point in obstacle.find_all('point')
-            ]
-            for obstacle in soup.find_all('obstacle')
-        ]
+        # Obstacle trajectories padded to the longest one: times with infinity, points with the last point
+        self.obstacle_lengths = np.diff(task.obstacle_offsets)
+        self.obstacle_times, self.obstacle_points = pad_trajectories(task.obstacle_points, task.obstacle_offsets)
 
-        self.path_time = int(soup.find('summary')['pathlength'])
-        # self.path_time = max([obstacle[-1][-1] for obstacle in self.obstacles])
+        # The log may hold the path with collapsed waits, so the duration is the time of its last point
+        has_path = task.path_points is not None and len(task.path_points) > 0
+        self.path_time = int(np.ceil(task.path_points[-1, 2])) if has_path else 0
 
 
 
         if self.path_time == 0:
-            self.path = [self.start + [0.0]]
+            path = np.array([self.start + [0.0]])
             self.path_time = 100
         else:
-            self.path = [
-                [int(point['x']) - 1, int(point['y']) - 1, float(point['time'])]
-                for point in soup.find('path').find_all('point')
-            ]
-
-
-    def getPosition(self, path, time):
-        point_i = bisect_left(path, time, key=lambda point: point[2])
-
-        if point_i == len(path):
-            return path[-1][:2]
-
-        point = np.array(path[point_i])
-        if point[2] == time:
-            return point[0:2]
-        else:
-            prev_point = np.array(path[point_i - 1])
-            k = (time - prev_point[2]) / (point[2] - prev_point[2])
-            return (prev_point + k * (point - prev_point))[:2]
-
-
-def create_animation(map, zoom_eps=None):
+            path = task.path_points.astype(np.float64)
+        self.path_times, self.path_points = path[None, :, 2], path[None, :, :2]
+        self.path_length = np.array([len(path)])
+
+    def getPositions(self, time):
+        """
+        Returns the x and y arrays of all obstacles at the time.
+        """
+        return interpolate(self.obstacle_times, self.obstacle_points, self.obstacle_lengths, time)
+
+    def getAgentPosition(self, time):
+        x, y = interpolate(self.path_times, self.path_points, self.path_length, time)
+        return x[0], y[0]
+
+
+def pad_trajectories(points, offsets):
+    """
+    Packs the flat (N, 3) obstacle points into a (K, P) array of times, padded with
+    infinity, and a (K, P, 2) array of positions, padded with the last position.
+    """
+    lengths = np.diff(offsets)
+    count, width = len(lengths), int(lengths.max()) if len(lengths) else 1
+    rows = np.repeat(np.arange(count), lengths)
+    columns = np.arange(len(points)) - np.repeat(offsets[:-1], lengths)
+
+    times = np.full((count, width), np.inf)
+    times[rows, columns] = points[:, 2]
+    positions = np.zeros((count, width, 2))
+    positions[rows, columns] = points[:, :2]
+    last = np.maximum(lengths - 1, 0)
+    padding = np.arange(width)[None, :] >= lengths[:, None]
+    positions[padding] = np.repeat(positions[np.arange(count), last], width - lengths, axis=0)
+    return times, positions
+
+
+def interpolate(times, positions, lengths, time):
+    """
+    Positions of all trajectories at the time, as x and y arrays: a trajectory is
+    linearly interpolated between its points and stays at its last point after it.
+    """
+    index = np.minimum((times < time).sum(axis=1), lengths - 1)
+    previous = np.maximum(index - 1, 0)
+    rows = np.arange(len(times))
+    begin, end = times[rows, previous], times[rows, index]
+    duration = end - begin
+    k = np.clip(np.divide(time - begin, duration, out=np.ones_like(duration), where=duration > 0), 0.0, 1.0)
+    position = positions[rows, previous] + k[:, None] * (positions[rows, index] - positions[rows, previous])
+    return position[:, 0], position[:, 1]
+
+
+# ffmpeg from PATH, or the Homebrew one if it is not on PATH
+FFMPEG_PATH = shutil.which('ffmpeg') or '/opt/homebrew/bin/ffmpeg'
+FPS = 50
+BITRATE = 4000
+DPI = 400
+
+
+def get_frames(map):
+    return np.linspace(0, map.path_time + 2, 800 * (map.path_time // 300 + 1))
+
+
+def create_animation(map, zoom_eps=None, frames=None):
     fig, ax = plt.subplots(figsize=(7, 4))
-    plt.rcParams['animation.ffmpeg_path'] = '/opt/homebrew/bin/ffmpeg'
+    plt.rcParams['animation.ffmpeg_path'] = FFMPEG_PATH
     cmap = mcolors.ListedColormap(['white', 'black'])
     ax.imshow(map.grid, cmap)
 
@@ -84,8 +123,7 @@ def create_animation(map, zoom_eps=None):
     ax.grid(which='minor', color='black', linewidth=0.5, linestyle='--')
 
     # Start positions of obstacles and agent
-    start_x = [map.obstacles[i][0][0] for i in range(len(map.obstacles))]
-    start_y = [map.obstacles[i][0][1] for i in range(len(map.obstacles))]
+    start_x, start_y = map.obstacle_points[:, 0, 0], map.obstacle_points[:, 0, 1]
     if max(map.width, map.height) < 50:
         points, = ax.plot(start_x, start_y, marker="o", ls='', label='obstacles')
         agent, = ax.plot(map.start[0], map.start[1], marker="o", color='red', ls='', label='agent')
@@ -101,12 +139,9 @@ def create_animation(map, zoom_eps=None):
 
     # Update positions of obstacles and agents
     def update(time):
-        x, y = [0] * len(map.obstacles), [0] * len(map.obstacles)
-        for i in range(len(map.obstacles)):
-            x[i], y[i] = map.getPosition(map.obstacles[i], time)
-        points.set_data((x, y))
+        points.set_data(map.getPositions(time))
 
-        x, y = map.getPosition(map.path, time)
+        x, y = map.getAgentPosition(time)
         agent.set_data((x, y))
 
         if zoom_eps is not None:
@@ -115,12 +150,56 @@ def create_animation(map, zoom_eps=None):
         return points, agent, 
         
     anim = animation.FuncAnimation(fig, update, interval=5, blit=True, repeat=False,
-                                frames=np.linspace(0, map.path_time + 2, 800 * (map.path_time // 300 + 1)))
+                                frames=get_frames(map) if frames is None else frames)
 
     print("Animation is created, ready to save")
     return anim
 
 
+def print_progress(done, total):
+    if done == total or done % max(total // 20, 1) == 0:
+        print(f"\rRendered {done}/{total} frames ({100 * done / total:.0f}%)", end="\n" if done == total else "",
+              flush=True)
+
+
+def save_serial(map, zoom_eps, output_file):
+    anim = create_animation(map, zoom_eps)
+    writermp4 = animation.writers['ffmpeg'](fps=FPS, bitrate=BITRATE)
+    anim.save(output_file, writermp4, dpi=DPI, progress_callback=lambda i, n: print_progress(i + 1, n))
+
+
+def render_chunk(map, zoom_eps, frames, chunk_file):
+    plt.rcParams['animation.ffmpeg_path'] = FFMPEG_PATH
+    anim = create_animation(map, zoom_eps, frames)
+    anim.save(chunk_file, animation.writers['ffmpeg'](fps=FPS, bitrate=BITRATE), dpi=DPI)
+    plt.close('all')
+    return len(frames)
+
+
+def save_parallel(map, zoom_eps, output_file, jobs):
+    """
+    Splits the frames into consecutive chunks, renders every chunk into its own video
+    in a process pool and joins the chunks into output_file with the ffmpeg concat demuxer.
+    """
+    frames = get_frames(map)
+    chunks = [chunk for chunk in np.array_split(frames, jobs * 4) if len(chunk)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chunk_files = [os.path.join(tmp_dir, f"chunk_{index:04d}.mp4") for index in range(len(chunks))]
+        done = 0
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = [executor.submit(render_chunk, map, zoom_eps, chunk, chunk_file)
+                       for chunk, chunk_file in zip(chunks, chunk_files)]
+            for future in as_completed(futures):
+                done += future.result()
+                print_progress(done, len(frames))
+
+        list_file = os.path.join(tmp_dir, "chunks.txt")
+        with open(list_file, 'w') as f:
+            f.writelines(f"file '{chunk_file}'\n" for chunk_file in chunk_files)
+        subprocess.run([FFMPEG_PATH, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file,
+                        "-c", "copy", output_file], check=True)
+
+
 def get_zoom():
     default_values = [10, 10]
     if "-zoom" not in sys.argv:
@@ -155,37 +234,47 @@ def get_outputfile():
     return sys.argv[index + 1]
 
 
+def get_jobs():
+    if "-jobs" not in sys.argv:
+        return 1
 
+    index = sys.argv.index("-jobs")
+    try:
+        return max(int(sys.argv[index + 1]), 1)
+    except (IndexError, ValueError):
+        return os.cpu_count() or 1
 
-if len(sys.argv) < 2:
-    print("Error: input file is not specified")
-    sys.exit()
 
-input_file = sys.argv[1]
-try:
-    map = Map(input_file)
-except:
-    print("Invalid input file.")
-    sys.exit()
+def main():
+    if len(sys.argv) < 2:
+        print("Error: input file is not specified")
+        sys.exit()
 
-output_file = get_outputfile()
-if output_file is None:
-    output_file = input_file[:-4] + ".mp4"
+    input_file = sys.argv[1]
+    try:
+        map = Map(input_file)
+    except:
+        print("Invalid input file.")
+        sys.exit()
 
-zoom_eps = get_zoom()
+    output_file = get_outputfile()
+    if output_file is None:
+        output_file = input_file[:-4] + ".mp4"
 
-# plt.show()
+    zoom_eps = get_zoom()
+    jobs = get_jobs()
 
-writermp4 = animation.writers['ffmpeg'](fps=50, bitrate=4000)
+    # plt.show()
 
-try:
-    anim = create_animation(map, zoom_eps)
-except:
-    print("animation err")
-    sys.exit()
-
-try:
-    anim.save(output_file, writermp4, dpi=400)
-except Exception as e:
-    print(e)
-    sys.exit()
\ No newline at end of file
+    try:
+        if jobs > 1:
+            save_parallel(map, zoom_eps, output_file, jobs)
+        else:
+            save_serial(map, zoom_eps, output_file)
+    except Exception as e:
+        print(e)
+        sys.exit()
+
+
+if __name__ == "__main__":
+    main()